@@ -5,3 +5,36 @@ class Options:
     PYSZZ_HOME = os.path.dirname(os.path.realpath(__file__))
 
     TEMP_WORKING_DIR = '_szztemp'
+
+    # Folder of the persistent per-repository caches (e.g. the commit metadata index), kept among runs
+    CACHE_DIR = '_szzcache'
+
+    # How local repositories are set up in the temp folder: 'shared' (clone sharing the object store of the local
+    # repository) or 'copy' (full copy of the repository)
+    WORKSPACE_MODE = 'shared'
+
+    # Max total size (in bytes) of the file contents kept in memory by each SZZ session
+    BLOB_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+    # Max number of parsed comment indexes kept in memory by each SZZ session
+    COMMENT_INDEX_CACHE_SIZE = 4096
+
+    # Parse the comments of C-family files (C/C++, C#, Java) with srcML instead of the built-in comment scanner
+    SRCML_COMMENT_PARSER = False
+
+    # Max number of git blame processes running at the same time for each repository, when the impacted files of a
+    # fix commit are blamed concurrently (1 blames them one after another)
+    BLAME_MAX_PROCESSES = min(4, os.cpu_count() or 1)
+
+    # Cache the git blame results in Options.CACHE_DIR, so that they are shared by the SZZ variants and among runs
+    BLAME_CACHE = True
+
+    # Max number of git blame results kept in the blame cache (the least recently used ones are evicted first)
+    BLAME_CACHE_MAX_ENTRIES = 500000
+
+    # Max number of srcml processes running at the same time
+    SRCML_MAX_PROCESSES = os.cpu_count() or 1
+
+    # RA-SZZ mines the uncached commits of a blame round with a single RefactoringMiner run on the smallest commit
+    # range containing them, if the range has at most this many commits per commit to mine
+    REFMINER_BATCH_RANGE_FACTOR = 3
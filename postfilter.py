@@ -1,9 +1,11 @@
 import json
 import logging as log
+import multiprocessing as mp
 import os
 import sys
-from typing import List
-import dateparser as dp
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from szz.common.commit_dates import read_commit_dates
 from szz.common.issue_date import parse_issue_date
 
 log.basicConfig(level=log.INFO, format='%(asctime)s :: %(funcName)s - %(levelname)s :: %(message)s')
@@ -19,47 +21,63 @@ REPOS_FOLDER = sys.argv[2]
 SUFFIX = ".issue-filter.json"
 
 
-def get_authored_date(repo_full_name: str, commit: str) -> str:
-    wd = os.getcwd()
-    os.chdir(os.path.join(REPOS_FOLDER, repo_full_name))
-    out = os.popen('git show -s --format=%aI "{}"'.format(commit)).read()
-    os.chdir(wd)
+def get_commit_dates(bugfix_commits: List[Dict]) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """ Read the dates of all the inducing commits, with a single git process per repository """
+    repo_commits = defaultdict(set)
+    for bfc in bugfix_commits:
+        repo_commits[bfc["repo_name"]].update(bfc["inducing_commit_hash"])
 
-    return out.strip()
+    commit_dates = dict()
+    for repo_name, commits in repo_commits.items():
+        for c, dates in read_commit_dates(os.path.join(REPOS_FOLDER, repo_name), commits).items():
+            commit_dates[(repo_name, c)] = dates
 
+    return commit_dates
 
-def filter_by_issue_date(repo, issue_date, bic) -> List:
+
+def filter_by_issue_date(repo, issue_date, bic, commit_dates) -> List:
     bic_new = list()
     for c in bic:
-        commit_date = dp.parse(get_authored_date(repo, c))
-        if commit_date.timestamp() < issue_date.parsed.timestamp():
+        authored_date = commit_dates[(repo, c)][0]
+        if authored_date < issue_date.cutoff:
             bic_new.append(c)
-            log.info("Kept {} {}".format(c, commit_date.isoformat()))
+            log.info("Kept {} {}".format(c, authored_date))
         else:
-            log.info("Filtered out {}".format(c, commit_date.isoformat()))
+            log.info("Filtered out {} {}".format(c, authored_date))
 
     return bic_new
 
 
+def process_file(f: str):
+    log.info(f)
+    bugfix_commits_new = list()
+    with open(os.path.join(RESULTS_FOLDER, f), "r") as infile:
+        bugfix_commits = json.load(infile)
+        commit_dates = get_commit_dates(bugfix_commits)
+        parsed_dates = dict()
+        for bfc in bugfix_commits:
+            log.info("Processing {} {}".format(bfc["repo_name"], bfc["fix_commit_hash"]))
+            assert not ("earliest_issue_date" in bfc and "best_scenario_issue_date" in bfc), "The json in {} contains both the earliest issue date and the best_scenario_issue_date".format(f)
+
+            issue_date = parse_issue_date(bfc, parsed_dates)
+            log.info(issue_date)
+
+            bfc["inducing_commit_hash"] = filter_by_issue_date(bfc["repo_name"], issue_date, bfc["inducing_commit_hash"], commit_dates)
+            bugfix_commits_new.append(bfc)
+
+    with open(os.path.join(RESULTS_FOLDER, f.replace(".json", SUFFIX)), "w") as outfile:
+        json.dump(bugfix_commits_new, outfile)
+
+
 def main():
-    for f in os.listdir(RESULTS_FOLDER):
-        if f.endswith(".json") and not f.endswith(SUFFIX):
-            log.info(f)
-            bugfix_commits_new = list()
-            with open(os.path.join(RESULTS_FOLDER, f), "r") as infile:
-                bugfix_commits = json.load(infile)
-                for bfc in bugfix_commits:
-                    log.info("Processing {} {}".format(bfc["repo_name"], bfc["fix_commit_hash"]))
-                    assert not ("earliest_issue_date" in bfc and "best_scenario_issue_date" in bfc), "The json in {} contains both the earliest issue date and the best_scenario_issue_date".format(f)
-
-                    issue_date = parse_issue_date(bfc)
-                    log.info(issue_date)
-
-                    bfc["inducing_commit_hash"] = filter_by_issue_date(bfc["repo_name"], issue_date, bfc["inducing_commit_hash"])
-                    bugfix_commits_new.append(bfc)
-
-            with open(os.path.join(RESULTS_FOLDER, f.replace(".json", SUFFIX)), "w") as outfile:
-                json.dump(bugfix_commits_new, outfile)
+    files = [f for f in os.listdir(RESULTS_FOLDER) if f.endswith(".json") and not f.endswith(SUFFIX)]
+    if len(files) > 1:
+        # the result files are independent, so they are processed in parallel
+        with mp.Pool(processes=min(len(files), os.cpu_count() or 1)) as pool:
+            pool.map(process_file, files)
+    else:
+        for f in files:
+            process_file(f)
 
 
 if __name__ == "__main__":
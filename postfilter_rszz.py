@@ -1,9 +1,11 @@
 import json
 import logging as log
+import multiprocessing as mp
 import os
 import sys
-import dateparser as dp
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from szz.common.commit_dates import read_commit_dates
 
 log.basicConfig(level=log.INFO, format='%(asctime)s :: %(funcName)s - %(levelname)s :: %(message)s')
 
@@ -19,53 +21,68 @@ SUFFIX = ".rszz.json"
 
 
 class Commit:
-    def __init__(self, hash: str, date: 'datatime'):
+    def __init__(self, hash: str, date: int):
         self.hash = hash
         self.date = date
 
 
-def get_committed_date(repo_full_name: str, commit: str) -> str:
-    wd = os.getcwd()
-    os.chdir(os.path.join(REPOS_FOLDER, repo_full_name))
-    out = os.popen('git show -s --format=%cI "{}"'.format(commit)).read()
-    os.chdir(wd)
+def get_commit_dates(bugfix_commits: List[Dict]) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """ Read the dates of all the inducing commits, with a single git process per repository """
+    repo_commits = defaultdict(set)
+    for bfc in bugfix_commits:
+        repo_commits[bfc["repo_name"]].update(bfc["inducing_commit_hash"])
 
-    return out.strip()
+    commit_dates = dict()
+    for repo_name, commits in repo_commits.items():
+        for c, dates in read_commit_dates(os.path.join(REPOS_FOLDER, repo_name), commits).items():
+            commit_dates[(repo_name, c)] = dates
 
+    return commit_dates
 
-def select_latest_commit(repo, bic) -> List[str]:
+
+def select_latest_commit(repo, bic, commit_dates) -> List[str]:
     bic_new = list()
 
     latest = Commit(None, None)
     for c in bic:
-        commit_date = dp.parse(get_committed_date(repo, c))
-        if not latest.date or commit_date > latest.date:
-            latest = Commit(c, commit_date)
-            log.info("Kept {} {}".format(c, commit_date.isoformat()))
+        committed_date = commit_dates[(repo, c)][1]
+        if latest.date is None or committed_date > latest.date:
+            latest = Commit(c, committed_date)
+            log.info("Kept {} {}".format(c, committed_date))
         else:
-            log.info("Filtered out {}".format(c, commit_date.isoformat()))
+            log.info("Filtered out {} {}".format(c, committed_date))
     if latest.hash:
         bic_new.append(latest.hash)
 
     return bic_new
 
 
+def process_file(f: str):
+    log.info(f)
+    bugfix_commits_new = list()
+    with open(os.path.join(RESULTS_FOLDER, f), "r") as infile:
+        bugfix_commits = json.load(infile)
+        commit_dates = get_commit_dates(bugfix_commits)
+        for bfc in bugfix_commits:
+            log.info("Processing {} {}".format(bfc["repo_name"], bfc["fix_commit_hash"]))
+
+            repo_name = bfc["repo_name"]
+            bfc["inducing_commit_hash"] = select_latest_commit(repo_name, bfc["inducing_commit_hash"], commit_dates)
+            bugfix_commits_new.append(bfc)
+
+    with open(os.path.join(RESULTS_FOLDER, f.replace(".json", SUFFIX)), "w") as outfile:
+        json.dump(bugfix_commits_new, outfile)
+
+
 def main():
-    for f in os.listdir(RESULTS_FOLDER):
-        if f.endswith(".json") and not f.endswith(SUFFIX):
-            log.info(f)
-            bugfix_commits_new = list()
-            with open(os.path.join(RESULTS_FOLDER, f), "r") as infile:
-                bugfix_commits = json.load(infile)
-                for bfc in bugfix_commits:
-                    log.info("Processing {} {}".format(bfc["repo_name"], bfc["fix_commit_hash"]))
-
-                    repo_name = bfc["repo_name"]
-                    bfc["inducing_commit_hash"] = select_latest_commit(repo_name, bfc["inducing_commit_hash"])
-                    bugfix_commits_new.append(bfc)
-
-            with open(os.path.join(RESULTS_FOLDER, f.replace(".json", SUFFIX)), "w") as outfile:
-                json.dump(bugfix_commits_new, outfile)
+    files = [f for f in os.listdir(RESULTS_FOLDER) if f.endswith(".json") and not f.endswith(SUFFIX)]
+    if len(files) > 1:
+        # the result files are independent, so they are processed in parallel
+        with mp.Pool(processes=min(len(files), os.cpu_count() or 1)) as pool:
+            pool.map(process_file, files)
+    else:
+        for f in files:
+            process_file(f)
 
 
 if __name__ == "__main__":
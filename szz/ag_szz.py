@@ -1,11 +1,11 @@
 import logging as log
 import traceback
-from typing import List, Set
+from typing import Callable, Dict, List, Set, Tuple
 from time import time as ts
 from git import Commit
-from pydriller import RepositoryMining
 from szz.common.issue_date import filter_by_date
-from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.core.abstract_szz import AbstractSZZ, ImpactedFile, BlameData
+from szz.util import tracing
 
 
 class AGSZZ(AbstractSZZ):
@@ -19,45 +19,110 @@ class AGSZZ(AbstractSZZ):
     todo:
     """
 
+    # at each blame iteration, only the files having lines blamed on the newly ignored commits are blamed again. It
+    # requires _blame() to be the same as _blame_lines(), so it is disabled by the variants overriding _blame()
+    INCREMENTAL_REBLAME = True
+
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
+    @tracing.traced('change_size_filter')
     def _exclude_commits_by_change_size(self, commit_hash: str, max_change_size: int = 20) -> Set[str]:
+        """
+        Return the given commit and its most recent ancestors, in rev-list order, until the first commit modifying
+        at most max_change_size files. The count of modified files is read from the commit index.
+        """
         to_exclude = set()
-        repo_mining = RepositoryMining(self.repository_path, to_commit=commit_hash, order='reverse').traverse_commits()
-        for commit in repo_mining:
-            try:
-                if len(commit.modifications) > max_change_size:
-                    to_exclude.add(commit.hash)
-                else:
-                    break
-            except Exception as e:
-                log.error(f'unable to analyze commit: {self.repository_path} {commit.hash}')
+        for commit in self.commit_index.iter_ancestors(commit_hash):
+            if commit.files_changed > max_change_size:
+                to_exclude.add(commit.hash)
+            else:
+                break
 
         if len(to_exclude) > 0:
             log.info(f'count of commits excluded by change size > {max_change_size}: {len(to_exclude)}')
 
         return to_exclude
 
-    def _ag_annotate(self, impacted_files: List['ImpactedFile'], rev_pointer: str = 'HEAD^', **kwargs) -> Set[Commit]:
+    def _change_size_exclusions(self, commit_hash: str, max_change_size: int, cache: Dict[str, Set[str]]) -> Set[str]:
+        """
+        Same as _exclude_commits_by_change_size(), memoized in the given cache (commit hash -> commits to exclude), so
+        that each blamed commit is classified once along the blame iterations of a fix commit.
+        """
+        if commit_hash not in cache:
+            cache[commit_hash] = self._exclude_commits_by_change_size(commit_hash, max_change_size=max_change_size)
+        return cache[commit_hash]
+
+    def _ag_annotate(self, impacted_files: List['ImpactedFile'], rev_pointer: str = 'HEAD^',
+                     line_blames: Dict['ImpactedFile', Dict] = None, reblame_commits: Set[str] = None, **kwargs) -> Set['BlameData']:
+        """
+        Blame the modified lines of the impacted files, several files at the same time (see _blame_files()).
+
+        If line_blames is given (impacted file -> blame of each modified line, see _blame_lines()), the impacted files
+        are blamed incrementally: the files missing from line_blames are blamed and added to it, while the other files
+        are blamed again only if one of their lines is currently blamed on one of reblame_commits. The blame of the
+        other files does not change, as none of their lines goes through a newly ignored commit.
+
+        A file is always blamed again with all of its modified lines, as git blame also depends on the blamed line
+        ranges: the moved and copied lines (-M, -C) and the lines of ignored commits (--ignore-rev) are matched by
+        blocks of contiguous lines, so blaming fewer lines can change the blamed commits.
+        """
         blame_data = set()
+        if line_blames is None:
+            blame_infos = self._blame_files(lambda imp_file: self.__try_blame(
+                self._blame, rev_pointer, imp_file.file_path, imp_file.modified_lines, kwargs), impacted_files)
+            for blame_info in blame_infos:
+                if blame_info is not None:
+                    blame_data.update(blame_info)
+
+            return blame_data
+
+        lines_to_blame = dict()
+        for imp_file in impacted_files:
+            if imp_file not in line_blames:
+                lines_to_blame[imp_file] = imp_file.modified_lines
+            elif any(commit in reblame_commits for commit, _ in line_blames[imp_file].values()):
+                lines_to_blame[imp_file] = imp_file.modified_lines
+
+        blame_infos = self._blame_files(lambda imp_file: self.__try_blame(
+            self._blame_lines, rev_pointer, imp_file.file_path, lines_to_blame[imp_file], kwargs), list(lines_to_blame))
+        for imp_file, blame_info in zip(lines_to_blame, blame_infos):
+            if blame_info is not None:
+                line_blames[imp_file] = blame_info
+            else:
+                # the whole file is blamed again at the next iteration
+                line_blames.pop(imp_file, None)
+
         for imp_file in impacted_files:
-            try:
-                blame_info = self._blame(
-                    rev=rev_pointer,
-                    file_path=imp_file.file_path,
-                    modified_lines=imp_file.modified_lines,
-                    ignore_whitespaces=True,
-                    skip_comments=True,
-                    **kwargs
-                )
-                blame_data.update(blame_info)
-            except:
-                log.error(traceback.format_exc())
+            blame_data.update(self._merge_line_blames(line_blames.get(imp_file, dict())))
 
         return blame_data
 
+    @staticmethod
+    def __try_blame(blame: Callable, rev_pointer: str, file_path: str, modified_lines: List[int], kwargs: Dict):
+        """ Blame a file with the given blame method, returning None on errors """
+        try:
+            return blame(
+                rev=rev_pointer,
+                file_path=file_path,
+                modified_lines=modified_lines,
+                ignore_whitespaces=True,
+                skip_comments=True,
+                **kwargs
+            )
+        except:
+            log.error(traceback.format_exc())
+            return None
+
+    def _merge_line_blames(self, file_line_blames: Dict[int, Tuple]) -> Set['BlameData']:
+        """
+        Return the set of BlameData of the blamed lines of a file, as returned by _blame(): the lines of a file come
+        from a single git blame, and among equal BlameData (same line and path) the one output first is kept.
+        """
+        return {b_data for _, b_data in file_line_blames.values() if b_data is not None}
+
     # TODO: add type check on kwargs
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
         Find bug introducing commits candidates.
@@ -85,16 +150,20 @@ class AGSZZ(AbstractSZZ):
         start = ts()
         blame_data = list()
         commits_to_ignore = set()
+        new_commits_to_ignore = set()
+        line_blames = dict() if self.INCREMENTAL_REBLAME else None
+        change_size_exclusions = dict()  # commit hash -> commits excluded by change size, computed once per commit
         while to_blame:
             log.info(f"excluding commits: {params['ignore_revs_list']}")
-            blame_data = self._ag_annotate(impacted_files, **params)
+            blame_data = self._ag_annotate(impacted_files, line_blames=line_blames, reblame_commits=new_commits_to_ignore, **params)
 
             new_commits_to_ignore = set()
             for bd in blame_data:
-                if bd.commit.hexsha not in new_commits_to_ignore:
-                    if bd.commit.hexsha not in commits_to_ignore:
-                        new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size=max_change_size))
+                if bd.commit_hash not in new_commits_to_ignore:
+                    if bd.commit_hash not in commits_to_ignore:
+                        new_commits_to_ignore.update(self._change_size_exclusions(bd.commit_hash, max_change_size, change_size_exclusions))
 
+            new_commits_to_ignore.difference_update(commits_to_ignore)
             if len(new_commits_to_ignore) == 0:
                 to_blame = False
             elif ts() - start > (60 * 60 * 1):  # 1 hour max time
@@ -104,7 +173,7 @@ class AGSZZ(AbstractSZZ):
             commits_to_ignore.update(new_commits_to_ignore)
             params['ignore_revs_list'] = list(commits_to_ignore)
 
-        bic = {bd.commit for bd in blame_data if bd.commit.hexsha not in self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size)}
+        bic = {self._blamed_commit(bd.commit_hash) for bd in blame_data if bd.commit_hash not in self._change_size_exclusions(bd.commit_hash, max_change_size, change_size_exclusions)}
 
         if kwargs.get('issue_date_filter', False):
             bic = filter_by_date(bic, kwargs['issue_date'])
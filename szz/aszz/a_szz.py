@@ -7,6 +7,7 @@ from szz.aszz.code_block_parser import CodeBlockParser, CodeBlockRange
 from szz.core.abstract_szz import ImpactedFile, LineChangeType
 from szz.ma_szz import MASZZ
 from szz.r_szz import RSZZ
+from szz.util import tracing
 
 
 class ASZZ(MASZZ):
@@ -26,6 +27,7 @@ class ASZZ(MASZZ):
         super().__init__(repo_full_name, repo_url, repos_dir)
         self.__enable_experimental = False
 
+    @tracing.traced()
     def start(self, fix_commit_hash: str, commit_issue_date, **kwargs) -> Set[Commit]:
         self.__enable_experimental = kwargs.get('experimental', False)
 
@@ -76,20 +78,23 @@ class ASZZ(MASZZ):
         """
         new_imp_files = list()
 
-        for imp_file in impacted_files:
-            if imp_file.line_change_type == LineChangeType.ADD:
-                source_file_content = self._get_impacted_file_content(fix_commit_hash, imp_file)
-                code_blocks = self._parse_matching_code_blocks(imp_file.modified_lines, source_file_content, ntpath.basename(imp_file.file_path))
-                log.info(f"found code_blocks={[f'{cb.start}-{cb.end}' for cb in code_blocks]} for file={imp_file.file_path}")
-
-                lines_to_blame = set()
-                for cb in code_blocks:
-                    for l in range(cb.start, cb.end + 1):
-                        if l not in imp_file.modified_lines:
-                            lines_to_blame.add(l)
-                log.info(f"added lines to blame={lines_to_blame} for file={imp_file.file_path}")
-                if lines_to_blame:
-                    new_imp_files.append(ImpactedFile(imp_file.file_path, list(lines_to_blame), None))
+        # the code blocks of all the files with added lines are parsed at once (a single srcml run)
+        added_imp_files = [imp_file for imp_file in impacted_files if imp_file.line_change_type == LineChangeType.ADD]
+        all_cb_ranges = CodeBlockParser().parse_all([(self._get_impacted_file_content(fix_commit_hash, imp_file), ntpath.basename(imp_file.file_path))
+                                                     for imp_file in added_imp_files], self.__enable_experimental)
+
+        for imp_file, cb_ranges in zip(added_imp_files, all_cb_ranges):
+            code_blocks = self._select_matching_code_blocks(imp_file.modified_lines, cb_ranges)
+            log.info(f"found code_blocks={[f'{cb.start}-{cb.end}' for cb in code_blocks]} for file={imp_file.file_path}")
+
+            lines_to_blame = set()
+            for cb in code_blocks:
+                for l in range(cb.start, cb.end + 1):
+                    if l not in imp_file.modified_lines:
+                        lines_to_blame.add(l)
+            log.info(f"added lines to blame={lines_to_blame} for file={imp_file.file_path}")
+            if lines_to_blame:
+                new_imp_files.append(ImpactedFile(imp_file.file_path, list(lines_to_blame), None))
 
         log.info(f"new_imp_files={new_imp_files}")
 
@@ -106,6 +111,16 @@ class ASZZ(MASZZ):
         """
         cb_ranges = CodeBlockParser().parse(source_file_content, source_file_name, self.__enable_experimental)
 
+        return self._select_matching_code_blocks(lines_num, cb_ranges)
+
+    def _select_matching_code_blocks(self, lines_num: List, cb_ranges: List['CodeBlockRange']) -> Set['CodeBlockRange']:
+        """
+        Select the innermost code block line ranges containing the given lines
+
+        :param List[int] lines_num: line number
+        :param List[CodeBlockRange] cb_ranges: code block line ranges of the file
+        :returns Set[CodeBlockRange]
+        """
         matching_code_blocks = set()
         for line in lines_num:
             cb_temp = list()
@@ -1,6 +1,6 @@
 import logging as log
 import re
-from typing import List
+from typing import List, Tuple
 
 from szz.common.srcml_wrapper import SrcML
 
@@ -23,10 +23,31 @@ class CodeBlockParser:
 
         return self._parse_code_blocks_srcml(file_str, file_name)
 
+    def parse_all(self, files: List[Tuple[str, str]], experimental: bool = False) -> List[List]:
+        """
+        Parse the code blocks of several files, given as (file_str, file_name) pairs. The files parsed with srcML are
+        parsed with a single srcml run.
+        """
+        code_blocks = [None] * len(files)
+        srcml_files = list()
+        for i, (file_str, file_name) in enumerate(files):
+            if experimental and (file_name.endswith(".py") or file_name.endswith(".php") or file_name.endswith(".phpt") or file_name.endswith(".rb")):
+                code_blocks[i] = self.parse(file_str, file_name, experimental)
+            else:
+                srcml_files.append(i)
+
+        ast_xmls = SrcML().parse_files([(files[i][1], files[i][0]) for i in srcml_files])
+        for i, ast_xml in zip(srcml_files, ast_xmls):
+            code_blocks[i] = self._read_code_blocks_srcml(ast_xml, files[i][1])
+
+        return code_blocks
+
     def _parse_code_blocks_srcml(self, file_str: str, file_name: str) -> List:
+        return self._read_code_blocks_srcml(SrcML().parse_file(file_name, file_str), file_name)
+
+    def _read_code_blocks_srcml(self, process_out: str, file_name: str) -> List:
         code_block_ranges = list()
 
-        process_out = SrcML().parse_file(file_name, file_str)
         if process_out:
             for line in process_out.splitlines():
                 try:
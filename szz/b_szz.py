@@ -4,6 +4,7 @@ from typing import List, Set
 from git import Commit
 from szz.common.issue_date import filter_by_date
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.util import tracing
 
 
 class BaseSZZ(AbstractSZZ):
@@ -20,6 +21,7 @@ class BaseSZZ(AbstractSZZ):
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
         Find bug introducing commits candidates.
@@ -35,10 +37,9 @@ class BaseSZZ(AbstractSZZ):
         ignore_revs_file_path = kwargs.get('ignore_revs_file_path', None)
         self._set_working_tree_to_commit(fix_commit_hash)
 
-        bic = set()
-        for imp_file in impacted_files:
+        def blame(imp_file: 'ImpactedFile'):
             try:
-                blame_data = self._blame(
+                return self._blame(
                     rev='HEAD^',
                     file_path=imp_file.file_path,
                     modified_lines=imp_file.modified_lines,
@@ -46,9 +47,14 @@ class BaseSZZ(AbstractSZZ):
                     ignore_whitespaces=False,
                     skip_comments=False
                 )
-                bic.update([entry.commit for entry in blame_data])
             except:
                 log.error(traceback.format_exc())
+                return set()
+
+        bic = set()
+        # the impacted files are blamed several at the same time, and merged in order
+        for blame_data in self._blame_files(blame, impacted_files):
+            bic.update([self._blamed_commit(entry.commit_hash) for entry in blame_data])
 
         if kwargs.get('issue_date_filter', False):
             bic = filter_by_date(bic, kwargs['issue_date'])
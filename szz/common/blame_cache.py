@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from git import Actor, Commit, Repo
+from git.repo.base import BlameEntry
+from git.util import hex_to_bin
+
+from options import Options
+from szz.common.sqlite_schema import enable_wal, init_schema
+
+
+class BlameCache:
+    """
+    Persistent cache of the git blame results, shared by the SZZ variants and among runs. The key is made of the
+    repository, the blamed revision (resolved to a commit hash), the file path, the line ranges and the normalized
+    blame flags (-w, -M, -C level, ignored commits), so that a result never needs to be invalidated. The results are
+    stored as the compact list of blame entries, along with the metadata of the blamed commits, as zlib-compressed
+    JSON in a SQLite database in Options.CACHE_DIR.
+
+    The cache is bounded to Options.BLAME_CACHE_MAX_ENTRIES results, the least recently used ones are evicted first.
+    The cache can be shared among threads.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, cache_dir: str = None, max_entries: int = None):
+        """
+        :param str cache_dir: folder of the cache database (default Options.CACHE_DIR)
+        :param int max_entries: max count of cached results (default Options.BLAME_CACHE_MAX_ENTRIES)
+        :returns BlameCache
+        """
+        cache_dir = cache_dir or Options.CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__max_entries = max_entries or Options.BLAME_CACHE_MAX_ENTRIES
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(os.path.join(cache_dir, 'blames.db'), timeout=60, check_same_thread=False)
+        enable_wal(self.__db)
+        init_schema(self.__db, BlameCache.SCHEMA_VERSION, '''
+            DROP TABLE IF EXISTS blames;
+            CREATE TABLE IF NOT EXISTS blames (
+                key TEXT PRIMARY KEY,
+                result BLOB NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS blames_last_used ON blames (last_used);
+        ''')
+        self.__size = self.__db.execute('SELECT COUNT(*) FROM blames').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(repo_full_name: str, commit_hash: str, file_path: str, line_ranges: List[str],
+                 ignore_whitespaces: bool = False, detect_move_within_file: bool = False, detect_move_level: int = 0,
+                 ignore_revs: List[str] = None, ignore_revs_file_digest: str = None, git_version: Tuple = None) -> str:
+        """
+        Return the cache key of a blame.
+
+        :param str repo_full_name: full name of the repository
+        :param str commit_hash: full hash of the blamed revision
+        :param str file_path: path of the blamed file
+        :param List[str] line_ranges: line ranges of the blame (-L)
+        :param bool ignore_whitespaces: -w
+        :param bool detect_move_within_file: -M
+        :param int detect_move_level: count of -C (0 to 3)
+        :param List[str] ignore_revs: hashes of the ignored commits (--ignore-rev), in any order
+        :param str ignore_revs_file_digest: digest of the content of the ignore revs file (--ignore-revs-file)
+        :param Tuple git_version: version of git, as the blame heuristics can change among versions
+        :returns str key
+        """
+        key = [repo_full_name, commit_hash, file_path, list(line_ranges), bool(ignore_whitespaces),
+               bool(detect_move_within_file), detect_move_level, sorted(set(ignore_revs or list())),
+               ignore_revs_file_digest, list(git_version or list())]
+        return hashlib.sha1(json.dumps(key).encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def get(self, key: str, repository: Repo) -> Optional[List[BlameEntry]]:
+        """
+        :param str key: cache key (see make_key())
+        :param Repo repository: repository of the Commit objects of the returned entries
+        :returns List[BlameEntry] the cached blame entries, in the same format as Repo.blame_incremental(), or None
+            if the blame is not cached
+        """
+        with self.__lock:
+            row = self.__db.execute('SELECT result FROM blames WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self.__db:
+                self.__db.execute('UPDATE blames SET last_used = ? WHERE key = ?', (time.time(), key))
+
+        result = json.loads(zlib.decompress(row[0]).decode('utf-8', 'surrogateescape'))
+        commits = dict()
+        for hexsha, (author, author_mail, author_time, committer, committer_mail, committer_time) in result['commits'].items():
+            # the same commit metadata as parsed by Repo.blame_incremental()
+            commits[hexsha] = Commit(repository, hex_to_bin(hexsha),
+                                     author=Actor(author, author_mail), authored_date=author_time,
+                                     committer=Actor(committer, committer_mail), committed_date=committer_time)
+
+        return [BlameEntry(commits[hexsha], range(lineno, lineno + num_lines), orig_path,
+                           range(orig_lineno, orig_lineno + num_lines))
+                for hexsha, lineno, orig_path, orig_lineno, num_lines in result['entries']]
+
+    def put(self, key: str, entries: List[BlameEntry]):
+        """
+        :param str key: cache key (see make_key())
+        :param List[BlameEntry] entries: blame entries returned by Repo.blame_incremental()
+        """
+        commits = dict()
+        compact_entries = list()
+        for entry in entries:
+            commit = entry.commit
+            if commit.hexsha not in commits:
+                commits[commit.hexsha] = [commit.author.name, commit.author.email, commit.authored_date,
+                                          commit.committer.name, commit.committer.email, commit.committed_date]
+            compact_entries.append([commit.hexsha, entry.linenos.start, entry.orig_path, entry.orig_linenos.start,
+                                    len(entry.linenos)])
+
+        result = zlib.compress(json.dumps({'commits': commits, 'entries': compact_entries}).encode('utf-8', 'surrogateescape'))
+        with self.__lock, self.__db:
+            cursor = self.__db.execute('INSERT OR REPLACE INTO blames (key, result, last_used) VALUES (?, ?, ?)',
+                                       (key, result, time.time()))
+            self.__size += cursor.rowcount
+            if self.__size > self.__max_entries:
+                self.__evict()
+
+    def __evict(self):
+        # the size is only counted by this process, so it is refreshed before evicting. A tenth of the cache is
+        # evicted at once, so that eviction does not run at each insertion.
+        self.__size = self.__db.execute('SELECT COUNT(*) FROM blames').fetchone()[0]
+        if self.__size > self.__max_entries:
+            to_evict = self.__size - self.__max_entries + self.__max_entries // 10
+            self.__db.execute('DELETE FROM blames WHERE key IN (SELECT key FROM blames ORDER BY last_used LIMIT ?)', (to_evict,))
+            self.__size -= to_evict
+
+    @property
+    def stats(self) -> Tuple[int, int]:
+        """ :returns Tuple[int, int] the count of (hits, misses) """
+        return self.hits, self.misses
+
+    def close(self):
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
+
+    def __repr__(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return f'{self.__class__.__name__}(hits={self.hits},misses={self.misses},hit_rate={hit_rate:.1%})'
@@ -0,0 +1,32 @@
+import subprocess
+from typing import Dict, Iterable, Tuple
+
+
+def read_commit_dates(repository_path: str, commit_hashes: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Read the dates of the given commits with a single git process.
+
+    :param str repository_path: path of a local clone of the repository
+    :param Iterable[str] commit_hashes: full hashes of the commits
+    :returns Dict[str, Tuple[int, int]] commit hash -> (authored date, committed date), as epoch seconds
+    """
+    commit_hashes = set(commit_hashes)
+    if not commit_hashes:
+        return dict()
+
+    cmd = ['git', '-C', repository_path, 'log', '--no-walk', '--stdin', '--format=%H %at %ct']
+    p = subprocess.run(cmd, input=''.join(f'{c}\n' for c in commit_hashes).encode(), stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE)
+    if p.returncode != 0:
+        raise RuntimeError(f'unable to read commit dates of {repository_path}: {p.stderr.decode(errors="replace").strip()}')
+
+    dates = dict()
+    for line in p.stdout.decode().splitlines():
+        commit_hash, authored_date, committed_date = line.split()
+        dates[commit_hash] = (int(authored_date), int(committed_date))
+
+    missing = commit_hashes.difference(dates)
+    if missing:
+        raise KeyError(f'commits not found in {repository_path}: {sorted(missing)}')
+
+    return dates
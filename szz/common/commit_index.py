@@ -0,0 +1,370 @@
+import heapq
+import logging as log
+import os
+import sqlite3
+import subprocess
+import threading
+from typing import Iterator, List, Optional
+
+from options import Options
+from szz.common.sqlite_schema import init_schema
+
+# one record per commit: \x01 hash \0 parents \0 committer date \0 author date \0 raw body \0, followed by the
+# NUL-separated --raw entries of the commit (none for merge commits)
+_LOG_FORMAT = '%x01%H%x00%P%x00%ct%x00%at%x00%B%x00'
+# one record per commit: \x01 hash, followed by the --numstat lines of the commit
+_NUMSTAT_FORMAT = '%x01%H'
+
+RENAME = 'R'
+MODE_CHANGE = 'M'
+
+
+class CommitInfo:
+    """ Metadata of a single commit stored in the CommitIndex """
+
+    __slots__ = ('hash', 'parents', 'committed_date', 'authored_date', 'files_changed', 'is_revert')
+
+    def __init__(self, hash: str, parents: List[str], committed_date: int, authored_date: int, files_changed: int, is_revert: bool):
+        """
+        :param str hash: full hash of the commit
+        :param List[str] parents: full hashes of the parent commits
+        :param int committed_date: committer date (epoch seconds)
+        :param int authored_date: author date (epoch seconds)
+        :param int files_changed: count of files modified with respect to the first parent (0 for merge commits)
+        :param bool is_revert: the message starts with 'Revert' or contains 'This reverts commit'
+        :returns CommitInfo
+        """
+        self.hash = hash
+        self.parents = parents
+        self.committed_date = committed_date
+        self.authored_date = authored_date
+        self.files_changed = files_changed
+        self.is_revert = is_revert
+
+    @property
+    def is_merge(self) -> bool:
+        return len(self.parents) > 1
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(hash={self.hash},parents={self.parents},files_changed={self.files_changed},is_revert={self.is_revert})'
+
+
+class PathChange:
+    """ A rename or a file mode change recorded in the CommitIndex """
+
+    __slots__ = ('change', 'old_path', 'new_path')
+
+    def __init__(self, change: str, old_path: str, new_path: str):
+        """
+        :param str change: RENAME or MODE_CHANGE
+        :param str old_path: path before the change
+        :param str new_path: path after the change
+        :returns PathChange
+        """
+        self.change = change
+        self.old_path = old_path
+        self.new_path = new_path
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(change={self.change},old_path="{self.old_path}",new_path="{self.new_path}")'
+
+
+class CommitIndex:
+    """
+    Persistent index of the commit metadata of a repository, used by the change-size, merge and meta-change filters
+    instead of computing the diff of each blamed commit with PyDriller.
+
+    The index is built by a single 'git log --raw -M --root' pass and stored in a SQLite database in
+    Options.CACHE_DIR, one per repository. Diffs are computed against the first parent like PyDriller does, so the
+    recorded file counts and renames match PyDriller's commit.modifications (merge commits have no modifications).
+    The index keeps the set of tips whose whole history is indexed: commits that are not indexed yet are added by
+    logging only the commits that are not reachable from the known tips. The index can be shared among threads.
+
+    The count of modified lines of each commit, used by L-SZZ, is indexed on demand by a single 'git log --numstat'
+    pass over the indexed commits that do not have it yet.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, repo_full_name: str, repository_path: str, cache_dir: str = None):
+        """
+        :param str repo_full_name: full name of the repository, used as the name of the index database
+        :param str repository_path: path of a local clone of the repository, used to index new commits
+        :param str cache_dir: folder of the index databases (default Options.CACHE_DIR)
+        :returns CommitIndex
+        """
+        self.__repository_path = repository_path
+        self.__commits = dict()
+        self.__lock = threading.RLock()
+
+        cache_dir = cache_dir or Options.CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__db_path = os.path.join(cache_dir, f"{repo_full_name.replace('/', '_')}.commits.db")
+        self.__db = sqlite3.connect(self.__db_path, timeout=60, check_same_thread=False)
+        self.__init_schema()
+
+    def __init_schema(self):
+        # the index of a repository can be opened by several processes at once (e.g., two runs on the same repository)
+        version = init_schema(self.__db, CommitIndex.SCHEMA_VERSION, '''
+            DROP TABLE IF EXISTS commits;
+            DROP TABLE IF EXISTS path_changes;
+            DROP TABLE IF EXISTS tips;
+            CREATE TABLE IF NOT EXISTS commits (
+                ordinal INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                parents TEXT NOT NULL,
+                committed_date INTEGER NOT NULL,
+                authored_date INTEGER NOT NULL,
+                files_changed INTEGER NOT NULL,
+                is_revert INTEGER NOT NULL,
+                lines_changed INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS path_changes (
+                ordinal INTEGER NOT NULL,
+                change TEXT NOT NULL,
+                old_path TEXT NOT NULL,
+                new_path TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS path_changes_ordinal ON path_changes (ordinal);
+            CREATE TABLE IF NOT EXISTS tips (hash TEXT PRIMARY KEY);
+        ''')
+        if version not in (0, CommitIndex.SCHEMA_VERSION):
+            log.info(f'rebuilt commit index {self.__db_path} (schema {version})')
+
+    def close(self):
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
+            self.__commits.clear()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+
+    def __contains__(self, commit_hash: str) -> bool:
+        with self.__lock:
+            return self.__lookup(commit_hash) is not None
+
+    def get(self, commit_hash: str) -> 'CommitInfo':
+        """
+        Return the metadata of the given commit, indexing the new commits of the repository if it is not indexed yet.
+
+        :param str commit_hash: full hash of the commit
+        :returns CommitInfo commit metadata
+        """
+        with self.__lock:
+            info = self.__lookup(commit_hash)
+            if info is None:
+                self.update([commit_hash])
+                info = self.__lookup(commit_hash)
+                if info is None:
+                    raise KeyError(f'commit not found: {commit_hash}')
+
+        return info
+
+    def path_changes(self, commit_hash: str) -> List['PathChange']:
+        """
+        Return the renames and the file mode changes of the given commit (with respect to the first parent).
+
+        :param str commit_hash: full hash of the commit
+        :returns List[PathChange] path changes
+        """
+        with self.__lock:
+            self.get(commit_hash)
+            rows = self.__db.execute('SELECT change, old_path, new_path FROM path_changes '
+                                     'WHERE ordinal = (SELECT ordinal FROM commits WHERE hash = ?)', (commit_hash,))
+            return [PathChange(*row) for row in rows]
+
+    def lines_changed(self, commit_hash: str) -> int:
+        """
+        Return the count of lines added plus the count of lines deleted by the given commit (with respect to the first
+        parent, 0 for merge commits), as PyDriller's LinesCount. The line counts of all the indexed commits are
+        computed at once the first time, and then reused.
+
+        :param str commit_hash: full hash of the commit
+        :returns int count of modified lines
+        """
+        with self.__lock:
+            self.get(commit_hash)
+            query = 'SELECT lines_changed FROM commits WHERE hash = ?'
+            lines_changed = self.__db.execute(query, (commit_hash,)).fetchone()[0]
+            if lines_changed is None:
+                self.__update_lines_changed()
+                lines_changed = self.__db.execute(query, (commit_hash,)).fetchone()[0]
+
+            return lines_changed
+
+    def iter_ancestors(self, commit_hash: str) -> Iterator['CommitInfo']:
+        """
+        Iterate the given commit and its ancestors in the same order as 'git rev-list <commit_hash>', i.e. by
+        decreasing committer date, commits with the same date being returned in the order they were reached.
+
+        :param str commit_hash: full hash of the starting commit
+        :returns Iterator[CommitInfo] commits
+        """
+        seen = {commit_hash}
+        queue = [(0, 0, self.get(commit_hash))]
+        count = 1
+        while queue:
+            info = heapq.heappop(queue)[2]
+            yield info
+            for parent in info.parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    parent_info = self.get(parent)
+                    heapq.heappush(queue, (-parent_info.committed_date, count, parent_info))
+                    count += 1
+
+    def update(self, revs: List[str] = None) -> int:
+        """
+        Index the commits reachable from the refs of the repository and from the given revisions that are not
+        indexed yet.
+
+        :param List[str] revs: additional revisions to index
+        :returns int count of new indexed commits
+        """
+        with self.__lock:
+            tips = [row[0] for row in self.__db.execute('SELECT hash FROM tips')]
+            cmd = ['git', '-C', self.__repository_path, 'log', '--stdin', '--ignore-missing', '--raw', '-z',
+                   '--no-abbrev', '-M', '--root', '--no-color', '--no-ext-diff', f'--format={_LOG_FORMAT}']
+            cmd.append('--all')
+            cmd.extend(revs or list())
+
+            new_commits = list()
+            with subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+                # the already indexed history is excluded through stdin, as the count of tips is unbounded
+                p.stdin.write(''.join(f'^{tip}\n' for tip in tips).encode())
+                p.stdin.close()
+                buffer = b''
+                for chunk in iter(lambda: p.stdout.read(1 << 20), b''):
+                    records = (buffer + chunk).split(b'\x01')
+                    buffer = records.pop()
+                    new_commits.extend(CommitIndex.__parse_record(r) for r in records if r)
+                if buffer:
+                    new_commits.append(CommitIndex.__parse_record(buffer))
+                stderr = p.stderr.read().decode(errors='replace')
+
+            if p.returncode != 0:
+                raise RuntimeError(f'unable to index commits of {self.__repository_path}: {stderr.strip()}')
+
+            self.__store(new_commits, tips)
+            if new_commits:
+                log.info(f'commit index {self.__db_path}: {len(new_commits)} new commits')
+
+            return len(new_commits)
+
+    def __update_lines_changed(self):
+        # merge commits have no modifications in PyDriller, so they are not diffed
+        rows = self.__db.execute('SELECT hash, parents FROM commits WHERE lines_changed IS NULL').fetchall()
+        lines_changed = {commit_hash: 0 for commit_hash, parents in rows if ' ' in parents}
+        to_diff = [commit_hash for commit_hash, parents in rows if ' ' not in parents]
+
+        # the same diff options as the patches parsed by PyDriller (GitPython's diff-tree -M, the default algorithm)
+        cmd = ['git', '-C', self.__repository_path, 'log', '--stdin', '--no-walk', '--numstat', '-M', '--root',
+               '--diff-algorithm=myers', '--no-color', '--no-ext-diff', f'--format={_NUMSTAT_FORMAT}']
+        if to_diff:
+            with subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as p:
+                # git reads all the revisions from stdin before logging
+                p.stdin.write(''.join(f'{commit_hash}\n' for commit_hash in to_diff).encode())
+                p.stdin.close()
+                buffer = b''
+                for chunk in iter(lambda: p.stdout.read(1 << 20), b''):
+                    records = (buffer + chunk).split(b'\x01')
+                    buffer = records.pop()
+                    lines_changed.update(CommitIndex.__parse_numstat(r) for r in records if r)
+                if buffer:
+                    lines_changed.update([CommitIndex.__parse_numstat(buffer)])
+                stderr = p.stderr.read().decode(errors='replace')
+
+            if p.returncode != 0:
+                raise RuntimeError(f'unable to count modified lines of {self.__repository_path}: {stderr.strip()}')
+
+        with self.__db:
+            self.__db.executemany('UPDATE commits SET lines_changed = ? WHERE hash = ?',
+                                  [(count, commit_hash) for commit_hash, count in lines_changed.items()])
+        log.info(f'commit index {self.__db_path}: modified lines of {len(lines_changed)} commits')
+
+    @staticmethod
+    def __parse_numstat(record: bytes):
+        # <hash>, followed by one '<added>\t<deleted>\t<path>' line per file ('-' for binary files, which PyDriller
+        # counts as 0 lines as their patch has no lines)
+        lines = record.split(b'\n')
+        count = 0
+        for line in lines[1:]:
+            fields = line.split(b'\t', 2)
+            if len(fields) == 3:
+                count += sum(int(f) for f in fields[:2] if f != b'-')
+
+        return lines[0].decode().strip(), count
+
+    @staticmethod
+    def __parse_record(record: bytes):
+        fields = record.split(b'\0', 5)
+        commit_hash, parents, committed_date, authored_date, body = (f.decode('utf-8', 'replace') for f in fields[:5])
+        parents = parents.split()
+        body = body.strip()
+        is_revert = body.startswith('Revert') or 'This reverts commit' in body
+
+        files_changed = 0
+        path_changes = list()
+        tokens = [t.strip(b'\n') for t in fields[5].split(b'\0')] if len(fields) > 5 else list()
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            i += 1
+            if not token.startswith(b':'):
+                continue
+
+            # :<old mode> <new mode> <old sha> <new sha> <status>, followed by one path (two for renames and copies)
+            old_mode, new_mode, _, _, status = token[1:].decode().split(' ')
+            if status[0] in 'RC':
+                old_path, new_path = (t.decode('utf-8', 'replace') for t in tokens[i:i + 2])
+                i += 2
+            else:
+                old_path = new_path = tokens[i].decode('utf-8', 'replace')
+                i += 1
+
+            # the patch of a type change (e.g. a file replaced by a symlink) is made of a deletion and a creation,
+            # which PyDriller reports as two modifications
+            files_changed += 2 if status[0] == 'T' else 1
+            if status[0] == 'R':
+                path_changes.append((RENAME, old_path, new_path))
+            elif status[0] in 'MT' and old_mode != new_mode:
+                path_changes.append((MODE_CHANGE, old_path, new_path))
+
+        if len(parents) > 1:
+            files_changed = 0
+            path_changes = list()
+
+        return commit_hash, parents, int(committed_date), int(authored_date), files_changed, is_revert, path_changes
+
+    def __store(self, new_commits: List, old_tips: List[str]):
+        new_hashes = {c[0] for c in new_commits}
+        parents = {p for c in new_commits for p in c[1]}
+        # the new commits not having a child among them are the tips of the new history, while the old tips reached
+        # by the new history are not needed anymore
+        new_tips = new_hashes - parents
+        stale_tips = parents.intersection(old_tips)
+
+        with self.__db:
+            for commit_hash, commit_parents, committed_date, authored_date, files_changed, is_revert, path_changes in new_commits:
+                cursor = self.__db.execute(
+                    'INSERT OR IGNORE INTO commits (hash, parents, committed_date, authored_date, files_changed, is_revert) VALUES (?, ?, ?, ?, ?, ?)',
+                    (commit_hash, ' '.join(commit_parents), committed_date, authored_date, files_changed, int(is_revert)))
+                if cursor.rowcount > 0 and path_changes:
+                    self.__db.executemany('INSERT INTO path_changes (ordinal, change, old_path, new_path) VALUES (?, ?, ?, ?)',
+                                          [(cursor.lastrowid,) + change for change in path_changes])
+            self.__db.executemany('DELETE FROM tips WHERE hash = ?', [(tip,) for tip in stale_tips])
+            self.__db.executemany('INSERT OR IGNORE INTO tips (hash) VALUES (?)', [(tip,) for tip in new_tips])
+
+    def __lookup(self, commit_hash: str) -> Optional['CommitInfo']:
+        info = self.__commits.get(commit_hash)
+        if info is None:
+            row = self.__db.execute('SELECT hash, parents, committed_date, authored_date, files_changed, is_revert '
+                                    'FROM commits WHERE hash = ?', (commit_hash,)).fetchone()
+            if row is not None:
+                info = CommitInfo(row[0], row[1].split(), row[2], row[3], row[4], bool(row[5]))
+                self.__commits[commit_hash] = info
+
+        return info
@@ -1,9 +1,18 @@
 import logging as log
-from typing import Dict
+import math
+import re
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional
 from typing import Set
 
-import dateparser as dp
-from git import Commit
+from szz.util import tracing
+
+if TYPE_CHECKING:
+    from git import Commit
+
+# ISO 8601 / RFC 3339 date and time, with optional seconds, fraction of second and UTC offset
+_ISO_8601 = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?'
+                       r'\s*(?:(Z)|([+-])(\d{2}):?(\d{2})?)?', re.IGNORECASE)
 
 
 class IssueDateInfo():
@@ -11,15 +20,18 @@ class IssueDateInfo():
         self.source = source
         self.parsed = parsed
         self.date_tag = date_tag
+        # commits authored before the cutoff (epoch seconds) precede the issue
+        self.cutoff = math.ceil(parsed.timestamp())
 
     def __repr__(self):
         return f"{self.__class__.__name__}(source_date={self.source},parsed_date={self.parsed},date_tag={self.date_tag}"
 
 
-def parse_issue_date(commit: Dict) -> 'IssueDateInfo':
+def parse_issue_date(commit: Dict, parsed_dates: Dict[str, 'datetime'] = None) -> 'IssueDateInfo':
     """
     Reads iso date from commit and returns a MyIssueDate.
     Note: if the date is not timezone aware, it is assumed to be UTC.
+    The optional parsed_dates dict memoizes the parsed dates by source date.
     """
 
     source_date = None
@@ -34,17 +46,69 @@ def parse_issue_date(commit: Dict) -> 'IssueDateInfo':
     assert source_date is not None, f'No issue date found in commit {commit}'
     assert date_tag is not None, f'Invalid date tag for commit {commit}'
 
-    parsed_date = dp.parse(source_date)
-    if not parsed_date.tzinfo:
-        parsed_date = dp.parse(source_date + ' UTC')
+    if parsed_dates is None:
+        return IssueDateInfo(source_date, parse_date(source_date), date_tag)
+
+    if source_date not in parsed_dates:
+        parsed_dates[source_date] = parse_date(source_date)
+    return IssueDateInfo(source_date, parsed_dates[source_date], date_tag)
+
+
+def parse_issue_dates(commits: List[Dict]) -> List[Optional['IssueDateInfo']]:
+    """
+    Parse the issue dates of all the given commits in a single pass, parsing each distinct date once. The commits
+    without a valid issue date get None (see parse_issue_date() for the error).
+    """
+    parsed_dates = dict()
+    issue_dates = list()
+    for commit in commits:
+        try:
+            issue_dates.append(parse_issue_date(commit, parsed_dates))
+        except Exception:
+            issue_dates.append(None)
+
+    return issue_dates
+
+
+def parse_date(source_date: str) -> 'datetime':
+    """
+    Parse a date, assuming UTC if it is not timezone aware. ISO 8601 dates are parsed directly, the other formats
+    are parsed by dateparser.
+    """
+    parsed_date = _parse_iso_8601(source_date)
+    if parsed_date is None:
+        import dateparser as dp
+
+        parsed_date = dp.parse(source_date)
+        if not parsed_date.tzinfo:
+            parsed_date = dp.parse(source_date + ' UTC')
+
+    return parsed_date
+
+
+def _parse_iso_8601(source_date: str) -> Optional['datetime']:
+    """ Return the ISO 8601 date as parsed by dateparser (fraction truncated to microseconds), None if not ISO 8601 """
+    match = _ISO_8601.fullmatch(source_date.strip())
+    if not match:
+        return None
 
-    return IssueDateInfo(source_date, parsed_date, date_tag)
+    year, month, day, hour, minute, second, fraction, utc, sign, offset_hours, offset_minutes = match.groups()
+    try:
+        tz = timezone.utc
+        if sign and (offset_hours != '00' or (offset_minutes or '00') != '00'):
+            offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes or 0))
+            tz = timezone(-offset if sign == '-' else offset)
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0),
+                        int((fraction or '0')[:6].ljust(6, '0')), tzinfo=tz)
+    except ValueError:
+        return None
 
 
-def filter_by_date(bic: Set[Commit], issue_date: 'IssueDateInfo') -> Set[Commit]:
+@tracing.traced('date_filter')
+def filter_by_date(bic: Set['Commit'], issue_date: 'IssueDateInfo') -> Set['Commit']:
     """ Filter commits by authored_date using timestamp of issue date (UTC) """
 
-    bic_new = {commit for commit in bic if commit.authored_date < issue_date.parsed.timestamp()}
+    bic_new = {commit for commit in bic if commit.authored_date < issue_date.cutoff}
     log.info(f'Filtering by issue date returned {len(bic_new)} out of {len(bic)}')
 
     return bic_new
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Optional
+
+from options import Options
+from szz.common.sqlite_schema import enable_wal, init_schema
+
+
+class RefactoringCache:
+    """
+    Persistent cache of the RefactoringMiner results, keyed by (repository, commit, RefactoringMiner version). The
+    results are stored as zlib-compressed JSON in a SQLite database in Options.CACHE_DIR, shared by all the
+    repositories. The cache can be shared among threads.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, cache_dir: str = None):
+        """
+        :param str cache_dir: folder of the cache database (default Options.CACHE_DIR)
+        :returns RefactoringCache
+        """
+        cache_dir = cache_dir or Options.CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(os.path.join(cache_dir, 'refactorings.db'), timeout=60, check_same_thread=False)
+        enable_wal(self.__db)
+        init_schema(self.__db, RefactoringCache.SCHEMA_VERSION, '''
+            DROP TABLE IF EXISTS refactorings;
+            CREATE TABLE IF NOT EXISTS refactorings (
+                repo TEXT NOT NULL,
+                commit_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result BLOB NOT NULL,
+                PRIMARY KEY (repo, commit_hash, version)
+            );
+        ''')
+
+    def get(self, repo_full_name: str, commit_hash: str, version: str) -> Optional[Dict]:
+        """
+        :param str repo_full_name: full name of the repository
+        :param str commit_hash: full hash of the commit
+        :param str version: version of RefactoringMiner
+        :returns Dict the RefactoringMiner result of the commit, or None if it is not cached
+        """
+        with self.__lock:
+            row = self.__db.execute('SELECT result FROM refactorings WHERE repo = ? AND commit_hash = ? AND version = ?',
+                                    (repo_full_name, commit_hash, version)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode())
+
+    def put_all(self, repo_full_name: str, results: Dict[str, Dict], version: str):
+        """
+        :param str repo_full_name: full name of the repository
+        :param Dict[str, Dict] results: RefactoringMiner results by commit hash
+        :param str version: version of RefactoringMiner
+        """
+        with self.__lock, self.__db:
+            self.__db.executemany('INSERT OR REPLACE INTO refactorings (repo, commit_hash, version, result) VALUES (?, ?, ?, ?)',
+                                  [(repo_full_name, commit_hash, version, zlib.compress(json.dumps(result).encode()))
+                                   for commit_hash, result in results.items()])
+
+    def close(self):
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
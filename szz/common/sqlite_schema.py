@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+
+def enable_wal(db: sqlite3.Connection, timeout: float = 60):
+    """
+    Switch a database to the WAL journal mode, so that readers do not block the writer. The journal mode is stored in
+    the database, but switching it fails at once when another process holds a lock (the busy timeout of the
+    connection does not apply), so it is retried until the timeout.
+
+    :param sqlite3.Connection db: connection to the database
+    :param float timeout: max seconds to wait for the other processes
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            db.execute('PRAGMA journal_mode = WAL')
+            return
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def init_schema(db: sqlite3.Connection, schema_version: int, script: str) -> int:
+    """
+    Create the schema of a cache database, or rebuild it when the database has another version (PRAGMA user_version).
+    The cache databases are shared among processes (e.g., the workers of main.py), so the version is checked again
+    and the schema is created within a single write transaction, which the other processes wait for.
+    executescript() is not used, as it commits any pending transaction before running.
+
+    :param sqlite3.Connection db: connection to the database
+    :param int schema_version: current version of the schema
+    :param str script: statements dropping the old tables and creating the new ones, separated by ';'
+    :returns int the schema version found in the database (0 for a new database)
+    """
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    if version == schema_version:
+        return version
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        version = db.execute('PRAGMA user_version').fetchone()[0]
+        if version != schema_version:
+            for statement in script.split(';'):
+                if statement.strip():
+                    db.execute(statement)
+            db.execute(f'PRAGMA user_version = {schema_version}')
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    return version
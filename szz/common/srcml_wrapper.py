@@ -1,25 +1,54 @@
+import io
 import logging as log
 import os
+import re
 import subprocess
-import tempfile
+import tarfile
+import threading
 import traceback
-from pathlib import Path
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from options import Options
+from szz.util import tracing
+
+# languages of the file extensions supported by srcML, used when the source is given through stdin
+SRCML_LANGUAGES = {
+    '.c': 'C', '.h': 'C',
+    '.cpp': 'C++', '.cc': 'C++', '.cxx': 'C++', '.hpp': 'C++', '.hh': 'C++', '.hxx': 'C++', '.C': 'C++', '.H': 'C++',
+    '.cs': 'C#',
+    '.java': 'Java'
+}
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_UNIT_START_TAG = re.compile(r'<unit\b[^>]*>')
+_UNIT_NAMESPACES = re.compile(r'\sxmlns(?::\w+)?="[^"]*"')
+_UNIT_FILENAME = re.compile(r'\sfilename="([^"]*)"')
+_MEMBER_INDEX = re.compile(r'(?:^|/)(\d+)/[^/]*$')
+
+
+def srcml_language(file_name: str) -> Optional[str]:
+    """ Return the srcML language of the given file name, or None if the file extension is not supported """
+    ext = os.path.splitext(file_name)[1]
+    if ext in SRCML_LANGUAGES:
+        return SRCML_LANGUAGES[ext]
+    return SRCML_LANGUAGES.get(ext.lower())
 
 
 class SrcML:
     """
-    SrcML cli tool wrapper
+    SrcML cli tool wrapper. Sources are given to srcml through stdin, and the count of srcml processes running at the
+    same time is bounded by Options.SRCML_MAX_PROCESSES.
     """
 
+    __process_slots = threading.BoundedSemaphore(Options.SRCML_MAX_PROCESSES)
+
     def __init__(self, working_dir: str = Options.TEMP_WORKING_DIR):
         self.__working_dir = working_dir
 
-    def __run(self, args: List[str] = list()) -> 'SrcMLOutput':
+    def __run(self, args: List[str] = list(), input_bytes: bytes = None) -> 'SrcMLOutput':
         """
-        Execute SrcML cli tool. stderr is redirected to stdout.
+        Execute SrcML cli tool, writing the given input to its stdin.
 
         return: SrcMLOutput(exec_status, stdout)
         """
@@ -28,55 +57,134 @@ class SrcML:
         stdout = ''
         try:
             cmd = ['srcml'] + args
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-            stdout, stderr = p.communicate()
-            status = p.wait()
+            with SrcML.__process_slots, tracing.span('srcml', args=args, input_bytes=len(input_bytes or b'')):
+                p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                stdout, stderr = p.communicate(input_bytes)
+                status = p.wait()
 
             stdout = stdout.decode('utf-8')
             if status != 0:
-                raise Exception(stdout)
+                raise Exception(stderr.decode('utf-8', 'replace') or stdout)
         except:
             log.error(traceback.format_exc())
 
         return SrcMLOutput(status, stdout)
 
-    def __run_with_line_position(self, args: List[str] = None) -> 'SrcMLOutput':
+    def __run_with_line_position(self, args: List[str] = None, input_bytes: bytes = None) -> 'SrcMLOutput':
         """
         Run SrcML cli tool with line position enabled
         """
 
         args.insert(0, '--position')
 
-        return self.__run(args)
+        return self.__run(args, input_bytes)
+
+    @staticmethod
+    def __encode(input_file_str: str) -> bytes:
+        return input_file_str.encode('utf-8', 'replace')
 
     def parse_file(self, input_file_name: str, input_file_str: str, line_pos: bool = True) -> str:
         """
-        Parse a source file content with SrcML.
+        Parse a source file content with SrcML. The content is given through stdin, along with the language
+        of the file extension.
 
         return: AST XML string
         """
 
         ast_xml = ''
 
-        with tempfile.TemporaryDirectory(dir=self.__working_dir) as tmpdirname:
-            source_file = os.path.join(tmpdirname, input_file_name)
-            Path(source_file).parent.absolute().mkdir(parents=True, exist_ok=True)
+        language = srcml_language(input_file_name)
+        if not language:
+            log.error(f"file not supported by srcML: {input_file_name}")
+            return ast_xml
+
+        args = ['--language', language, '--filename', input_file_name]
+        if line_pos:
+            out = self.__run_with_line_position(args, SrcML.__encode(input_file_str))
+        else:
+            out = self.__run(args, SrcML.__encode(input_file_str))
+
+        if out.exec_status == 0:
+            ast_xml = out.stdout
+        else:
+            log.error(out.stdout)
+
+        return ast_xml
 
-            with open(source_file, 'w') as temp_file:
-                temp_file.write(input_file_str)
+    def parse_files(self, input_files: List[Tuple[str, str]], line_pos: bool = True) -> List[str]:
+        """
+        Parse several source file contents with a single srcml run. The contents are given through stdin as a tar
+        archive, and the units of the resulting srcML archive are split back into one AST XML string per file, in the
+        same format as parse_file(). The files missing from the srcML archive (or all of them, if the archive cannot be
+        parsed) are parsed one by one, with at most Options.SRCML_MAX_PROCESSES srcml processes at the same time.
 
-            args = [source_file]
+        return: list of AST XML strings, one per input file
+        """
+
+        ast_xmls = [None] * len(input_files)
+        supported = [i for i, (file_name, _) in enumerate(input_files) if srcml_language(file_name)]
+        if len(supported) > 1:
+            archive = io.BytesIO()
+            with tarfile.open(fileobj=archive, mode='w') as tar:
+                for i in supported:
+                    file_name, file_str = input_files[i]
+                    content = SrcML.__encode(file_str)
+                    # the index prefix keeps the member names unique, and the original extension selects the language
+                    member = tarfile.TarInfo(f'{i}/{os.path.basename(file_name)}')
+                    member.size = len(content)
+                    tar.addfile(member, io.BytesIO(content))
+
+            args = ['--filename', 'sources.tar']
             if line_pos:
-                out = self.__run_with_line_position(args)
+                out = self.__run_with_line_position(args, archive.getvalue())
             else:
-                out = self.__run(args)
+                out = self.__run(args, archive.getvalue())
 
             if out.exec_status == 0:
-                ast_xml = out.stdout
-            else:
-                log.error(out.stdout)
-
-        return ast_xml
+                for member_name, ast_xml in SrcML.__split_archive(out.stdout):
+                    member_index = _MEMBER_INDEX.search(member_name)
+                    if member_index and int(member_index.group(1)) in supported:
+                        ast_xmls[int(member_index.group(1))] = ast_xml
+
+        missing = [i for i in range(len(input_files)) if ast_xmls[i] is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=Options.SRCML_MAX_PROCESSES) as executor:
+                parsed = executor.map(lambda i: self.parse_file(input_files[i][0], input_files[i][1], line_pos), missing)
+                for i, ast_xml in zip(missing, parsed):
+                    ast_xmls[i] = ast_xml
+
+        return ast_xmls
+
+    @staticmethod
+    def __split_archive(archive_xml: str) -> List[Tuple[str, str]]:
+        """
+        Split a srcML archive into (filename, unit XML) pairs. The namespaces declared by the archive root are copied
+        into each unit, so that each unit is a standalone srcML document.
+        """
+        units = list()
+
+        root = _UNIT_START_TAG.search(archive_xml)
+        if not root:
+            return units
+        namespaces = ''.join(_UNIT_NAMESPACES.findall(root.group(0)))
+
+        pos = root.end()
+        while True:
+            unit = _UNIT_START_TAG.search(archive_xml, pos)
+            if not unit:
+                break
+            # source code is escaped in srcML, so the first closing tag is the end of the unit
+            end = archive_xml.find('</unit>', unit.end())
+            if end == -1:
+                break
+            end += len('</unit>')
+
+            file_name = _UNIT_FILENAME.search(unit.group(0))
+            start_tag = unit.group(0)[:len('<unit')] + namespaces + unit.group(0)[len('<unit'):]
+            units.append((file_name.group(1) if file_name else '', _XML_DECLARATION + start_tag + archive_xml[unit.end():end] + '\n'))
+            pos = end
+
+        return units
 
 
 class SrcMLOutput:
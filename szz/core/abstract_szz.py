@@ -1,18 +1,27 @@
+import hashlib
 import logging as log
 import ntpath
 import os
+import sys
+import threading
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from shutil import copytree
 from shutil import rmtree
 from tempfile import mkdtemp
-from typing import List, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from git import Commit, Repo
-from pydriller import ModificationType, GitRepository as PyDrillerGitRepo
 
 from options import Options
-from szz.core.comment_parser import parse_comments
+from szz.common.blame_cache import BlameCache
+from szz.common.commit_index import CommitIndex
+from szz.core.blob_cache import BlobCache, CachedBlob
+from szz.core.comment_parser import parse_comments, CommentIndex
+from szz.core.object_reader import GitObjectReader
+from szz.util import tracing
 
 
 class AbstractSZZ(ABC):
@@ -28,12 +37,18 @@ class AbstractSZZ(ABC):
         AbstractSZZ uses a temp folder to clone and interact with the given git repo, where
         the name of the repo folder will be the full name having '/' replaced with '_'.
         The init method also set the default_ignore_regex for modified lines.
+        Local repositories are set up according to Options.WORKSPACE_MODE (see __create_workspace()).
 
         :param str repo_full_name: full name of the Git repository to clone and interact with
         :param str repo_url: url of the Git repository to clone
         :param str repos_dir: temp folder where to clone the given repo
         """
         self._repository = None
+        self._object_reader = None
+        self._commit_index = None
+        self._blame_cache = None
+        self._closed = False
+        self._repo_full_name = repo_full_name
 
         os.makedirs(Options.TEMP_WORKING_DIR, exist_ok=True)
         self.__temp_dir = mkdtemp(dir=os.path.join(os.getcwd(), Options.TEMP_WORKING_DIR))
@@ -42,20 +57,79 @@ class AbstractSZZ(ABC):
             if repos_dir:
                 repo_dir = os.path.join(repos_dir, repo_full_name)
                 if os.path.isdir(repo_dir):
-                    copytree(repo_dir, self._repository_path, symlinks=True)
+                    with tracing.span('workspace', repo=repo_full_name, mode=Options.WORKSPACE_MODE):
+                        self.__create_workspace(repo_dir)
                 else:
                     log.error(f'unable to find local repository path: {repo_dir}')
                     exit(-4)
             else:
                 log.info(f"Cloning repository {repo_full_name}...")
-                Repo.clone_from(url=repo_url, to_path=self._repository_path)
+                with tracing.span('workspace', repo=repo_full_name, mode='clone'):
+                    Repo.clone_from(url=repo_url, to_path=self._repository_path)
 
         self._repository = Repo(self._repository_path)
+        self._object_reader = GitObjectReader(self._repository_path)
+        self._blob_cache = BlobCache(self.__show_file)
+        self._comment_indexes = OrderedDict()
+        self._comment_indexes_lock = threading.Lock()
+        # blamed commit hash -> Commit, as parsed by git blame
+        self._blamed_commits = dict()
+        if Options.BLAME_CACHE:
+            self._blame_cache = BlameCache()
+
+    def __create_workspace(self, repo_dir: str):
+        """
+        Create the local workspace of the given repository.
+
+        * 'shared' mode: the workspace is a 'git clone --shared --no-checkout' of the local repository, which uses
+          the source object store through git alternates. Only refs are written, and the working tree is populated by
+          the first checkout. The source repository must not be garbage collected while the workspace is in use.
+        * 'copy' mode: the whole repository, including the object store, is copied.
+
+        :param str repo_dir: path of the local repository
+        """
+        if Options.WORKSPACE_MODE == 'shared':
+            log.info(f"Creating shared workspace of {repo_dir}...")
+            Repo.clone_from(url=os.path.abspath(repo_dir), to_path=self._repository_path, shared=True, no_checkout=True)
+        elif Options.WORKSPACE_MODE == 'copy':
+            copytree(repo_dir, self._repository_path, symlinks=True)
+        else:
+            raise ValueError(f'invalid workspace mode: {Options.WORKSPACE_MODE}')
 
     def __del__(self):
+        self.close()
+
+    def __enter__(self) -> 'AbstractSZZ':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Release the local repository copy and the GitPython resources. An SZZ instance can be reused for any number
+        of fix commits of the same repository before being closed, so that the workspace and the warm caches are
+        shared among them. Calling close() more than once has no effect.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
         log.info("cleanup objects...")
-        self.__cleanup_repo()
+        if hasattr(self, '_blob_cache'):
+            log.info(f"blob cache: {self._blob_cache}")
+            self._blob_cache.clear()
+        if hasattr(self, '_blamed_commits'):
+            self._blamed_commits.clear()
+        if self._commit_index is not None:
+            self._commit_index.close()
+        if self._blame_cache is not None:
+            log.info(f"blame cache: {self._blame_cache}")
+            self._blame_cache.close()
+        if self._object_reader is not None:
+            self._object_reader.close()
         self.__clear_gitpython()
+        self.__cleanup_repo()
 
     @property
     def repository(self) -> Repo:
@@ -75,6 +149,17 @@ class AbstractSZZ(ABC):
         """
         return self._repository_path
 
+    @property
+    def commit_index(self) -> 'CommitIndex':
+        """
+         Getter of the persistent commit metadata index of the repository, opened on first use.
+
+         :returns CommitIndex commit_index
+        """
+        if self._commit_index is None:
+            self._commit_index = CommitIndex(self._repo_full_name, self.repository_path)
+        return self._commit_index
+
     @abstractmethod
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
@@ -87,6 +172,7 @@ class AbstractSZZ(ABC):
         """
         pass
 
+    @tracing.traced('impacted_files')
     def get_impacted_files(self, fix_commit_hash: str,
                            file_ext_to_parse: List[str] = None,
                            only_deleted_lines: bool = True) -> List['ImpactedFile']:
@@ -101,6 +187,9 @@ class AbstractSZZ(ABC):
         :param str fix_commit_hash: hash of fix commit to parse
         :returns List[ImpactedFile] impacted_files
         """
+        # PyDriller is slow to import, so it is imported only when needed
+        from pydriller import ModificationType, GitRepository as PyDrillerGitRepo
+
         impacted_files = list()
 
         fix_commit = PyDrillerGitRepo(self.repository_path).get_commit(fix_commit_hash)
@@ -161,6 +250,31 @@ class AbstractSZZ(ABC):
         :returns Set[BlameData] a set of bug introducing commits candidates, represented by BlameData object
         """
 
+        line_blames = self._blame_lines(rev, file_path, modified_lines, skip_comments, ignore_revs_list,
+                                        ignore_revs_file_path, ignore_whitespaces, detect_move_within_file,
+                                        detect_move_from_other_files)
+
+        # lines are added in the output order of git blame, which decides the BlameData kept among equal ones
+        return {b_data for _, b_data in line_blames.values() if b_data is not None}
+
+    def _blame_lines(self, rev: str,
+                     file_path: str,
+                     modified_lines: List[int],
+                     skip_comments: bool = False,
+                     ignore_revs_list: List[str] = None,
+                     ignore_revs_file_path: str = None,
+                     ignore_whitespaces: bool = False,
+                     detect_move_within_file: bool = False,
+                     detect_move_from_other_files: 'DetectLineMoved' = None
+                     ) -> Dict[int, Tuple[str, Optional['BlameData']]]:
+        """
+         Wrapper for Git blame command returning the blame of each modified line, in the output order of git blame.
+         The parameters are the same as _blame().
+
+        :returns Dict[int, Tuple[str, Optional[BlameData]]] modified line -> (hash of the blamed commit, BlameData),
+            where BlameData is None for the lines blamed on a comment line when skip_comments is set
+        """
+
         kwargs = dict()
         if ignore_whitespaces:
             kwargs['w'] = True
@@ -177,25 +291,84 @@ class AbstractSZZ(ABC):
         if detect_move_from_other_files and detect_move_from_other_files == DetectLineMoved.ANY_COMMIT:
             kwargs['C'] = [True, True, True]
 
-        bug_introd_commits = set()
+        line_blames = dict()
         mod_line_ranges = self._parse_line_ranges(modified_lines)
         log.info(f"processing file: {file_path}")
-        for entry in self.repository.blame_incremental(**kwargs, rev=rev, L=mod_line_ranges, file=file_path):
-            # entry.linenos = input lines to blame (current lines)
-            # entry.orig_lineno = output line numbers from blame (previous commit lines from blame)
-            for line_num in entry.orig_linenos:
-                source_file_content = self.repository.git.show(f"{entry.commit.hexsha}:{entry.orig_path}")
-                line_str = source_file_content.split('\n')[line_num - 1].strip()
-                b_data = BlameData(entry.commit, line_num, line_str, entry.orig_path)
-
-                if skip_comments and self._is_comment(line_num, source_file_content, ntpath.basename(b_data.file_path)):
-                    log.info(f"skip comment line ({line_num}): {line_str}")
-                    continue
+        with tracing.span('blame', file=file_path, rev=rev, lines=len(modified_lines)) as span:
+            blamed_lines = 0
+            for entry in self.__blame_entries(rev, file_path, mod_line_ranges, kwargs, span):
+                # entry.linenos = input lines to blame (current lines)
+                # entry.orig_lineno = output line numbers from blame (previous commit lines from blame)
+                commit_hash = sys.intern(entry.commit.hexsha)
+                self._blamed_commits.setdefault(commit_hash, entry.commit)
+                source_file = self._get_file_content(commit_hash, entry.orig_path)
+                for cur_line_num, line_num in zip(entry.linenos, entry.orig_linenos):
+                    b_data = BlameData(commit_hash, line_num, entry.orig_path, self)
+
+                    if skip_comments and self._is_comment(line_num, source_file, ntpath.basename(b_data.file_path)):
+                        log.info(f"skip comment line ({line_num}): {source_file.line(line_num).strip()}")
+                        line_blames[cur_line_num] = (commit_hash, None)
+                        continue
+
+                    log.info(b_data)
+                    line_blames[cur_line_num] = (commit_hash, b_data)
+                    blamed_lines += 1
+            span.set('blamed_lines', blamed_lines)
+
+        return line_blames
+
+    def __blame_entries(self, rev: str, file_path: str, mod_line_ranges: List[str], kwargs: Dict, span) -> List:
+        """
+        Run git blame, or read its result from the blame cache if enabled (Options.BLAME_CACHE).
 
-                log.info(b_data)
-                bug_introd_commits.add(b_data)
+        :returns List[BlameEntry] blame entries, as returned by Repo.blame_incremental()
+        """
+        if self._blame_cache is None:
+            return list(self.repository.blame_incremental(**kwargs, rev=rev, L=mod_line_ranges, file=file_path))
+
+        detect_move = kwargs.get('C', False)
+        ignore_revs_file_digest = None
+        if kwargs.get('ignore-revs-file'):
+            with open(kwargs['ignore-revs-file'], 'rb') as f:
+                ignore_revs_file_digest = hashlib.sha1(f.read()).hexdigest()
+        key = BlameCache.make_key(
+            self._repo_full_name,
+            # symbolic revisions (e.g. HEAD^) are resolved, as they move among fix commits
+            self._object_reader.read(f'{rev}^{{commit}}')[0],
+            file_path,
+            mod_line_ranges,
+            ignore_whitespaces=kwargs.get('w', False),
+            detect_move_within_file=kwargs.get('M', False),
+            detect_move_level=len(detect_move) if isinstance(detect_move, list) else int(bool(detect_move)),
+            ignore_revs=kwargs.get('ignore-rev'),
+            ignore_revs_file_digest=ignore_revs_file_digest,
+            git_version=self.repository.git.version_info
+        )
+
+        entries = self._blame_cache.get(key, self.repository)
+        span.set('cached', entries is not None)
+        if entries is None:
+            entries = list(self.repository.blame_incremental(**kwargs, rev=rev, L=mod_line_ranges, file=file_path))
+            self._blame_cache.put(key, entries)
+
+        return entries
+
+    def _blame_files(self, blame: Callable[['ImpactedFile'], object], impacted_files: List['ImpactedFile']) -> List:
+        """
+        Call the given blame function on each impacted file, blaming up to Options.BLAME_MAX_PROCESSES files at the
+        same time. Each blame is a git process, so the threads mostly wait for git outside the GIL. The results are
+        returned in the order of the impacted files, so that merging them gives the same result as blaming the files
+        one after another.
+
+        :param blame: function blaming an impacted file, called from the worker threads
+        :param List[ImpactedFile] impacted_files: impacted files to blame
+        :returns List the result of each blame
+        """
+        if Options.BLAME_MAX_PROCESSES <= 1 or len(impacted_files) <= 1:
+            return [blame(imp_file) for imp_file in impacted_files]
 
-        return bug_introd_commits
+        with ThreadPoolExecutor(max_workers=min(Options.BLAME_MAX_PROCESSES, len(impacted_files))) as executor:
+            return list(executor.map(blame, impacted_files))
 
     def _parse_line_ranges(self, modified_lines: List) -> List[str]:
         """
@@ -228,23 +401,40 @@ class AbstractSZZ(ABC):
 
         return mod_line_ranges
 
-    def _is_comment(self, line_num: int, source_file_content: str, source_file_name: str) -> bool:
+    def _is_comment(self, line_num: int, source_file: 'CachedBlob', source_file_name: str) -> bool:
         """
         Check if the given line is a comment. It uses a specific comment parser which returns the interval of line
-        numbers containing comments - CommentRange(start, end)
+        numbers containing comments - CommentRange(start, end). The comment ranges of each file content are parsed
+        only once per session, and then looked up in a CommentIndex.
 
         :param int line_num: line number
-        :param str source_file_content: The content of the file to parse
+        :param CachedBlob source_file: The content of the file to parse
         :param str source_file_name: The name of the file to parse
         :returns bool
         """
 
-        comment_ranges = parse_comments(source_file_content, source_file_name, self.__temp_dir)
+        return line_num in self._get_comment_index(source_file, source_file_name)
 
-        for comment_range in comment_ranges:
-            if comment_range.start <= line_num <= comment_range.end:
-                return True
-        return False
+    def _get_comment_index(self, source_file: 'CachedBlob', source_file_name: str) -> 'CommentIndex':
+        """
+        Return the comment index of the given file content, memoized by content digest and file name (which selects
+        the comment parser). The memo is bounded by Options.COMMENT_INDEX_CACHE_SIZE entries.
+        """
+        key = (source_file.digest, source_file_name)
+        with self._comment_indexes_lock:
+            comment_index = self._comment_indexes.get(key)
+            if comment_index is not None:
+                self._comment_indexes.move_to_end(key)
+                return comment_index
+
+        # parsed outside the lock, so that files blamed concurrently are parsed at the same time
+        comment_index = CommentIndex(parse_comments(source_file.content, source_file_name, self.__temp_dir))
+        with self._comment_indexes_lock:
+            self._comment_indexes[key] = comment_index
+            if len(self._comment_indexes) > Options.COMMENT_INDEX_CACHE_SIZE:
+                self._comment_indexes.popitem(last=False)
+
+        return comment_index
 
     def _set_working_tree_to_commit(self, commit: str):
         # self.repository.head.reference = self.repository.commit(fix_commit_hash)
@@ -253,12 +443,44 @@ class AbstractSZZ(ABC):
         assert not self.repository.head.is_detached
 
     def _get_impacted_file_content(self, fix_commit_hash: str, impacted_file: 'ImpactedFile') -> str:
-        return self.repository.git.show(f"{fix_commit_hash}:{impacted_file.file_path}")
+        return self._get_file_content(fix_commit_hash, impacted_file.file_path).content
+
+    def _get_file_content(self, commit_hash: str, file_path: str) -> 'CachedBlob':
+        """
+        Return the content of a file at the given commit. Contents are served by the session blob cache, so that
+        each file revision is read from the repository only once, through the persistent git cat-file process of the
+        session.
+
+        :param str commit_hash: full hash of the commit
+        :param str file_path: path of the file in the given commit
+        :returns CachedBlob file content with line index
+        """
+        return self._blob_cache.get(commit_hash, file_path)
+
+    def __show_file(self, commit_hash: str, file_path: str) -> 'CachedBlob':
+        blob_hash, content = self._object_reader.read(f"{commit_hash}:{file_path}")
+        # same decoding as 'git show' run through GitPython, which also strips the trailing newline
+        if content.endswith(b'\n'):
+            content = content[:-1]
+        return CachedBlob(content.decode('utf-8', 'surrogateescape'), blob_hash)
 
     def get_commit(self, hash: str) -> Commit:
         """ return the Commit object for the given hash """
         return self.repository.commit(hash)
 
+    def _blamed_commit(self, commit_hash: str) -> Commit:
+        """
+        Return the Commit object of a commit blamed by _blame_lines(), as parsed by git blame (i.e., with the author
+        and committer metadata already set).
+
+        :param str commit_hash: hash of the blamed commit (BlameData.commit_hash)
+        :returns Commit blamed commit
+        """
+        commit = self._blamed_commits.get(commit_hash)
+        if commit is None:
+            commit = self.get_commit(commit_hash)
+        return commit
+
     def __cleanup_repo(self):
         """ Cleanup of local repository used by SZZ """
         if os.path.isdir(self.__temp_dir):
@@ -316,22 +538,40 @@ class ImpactedFile:
 
 
 class BlameData:
-    """ Data class to represent blame data """
-    def __init__(self, commit: Commit, line_num: int, line_str: str, file_path: str):
+    """
+    Data class to represent blame data. Only the (interned) hash of the blamed commit and the position of the line are
+    stored: the Commit object and the content of the line are resolved on demand by the SZZ session that blamed the
+    line (see AbstractSZZ._blamed_commit() and AbstractSZZ._get_file_content()), so they are available only while
+    the session is open. The file contents are thus bounded by the session blob cache (Options.BLOB_CACHE_MAX_BYTES).
+    """
+
+    __slots__ = ('commit_hash', 'line_num', 'file_path', '_session')
+
+    def __init__(self, commit_hash: str, line_num: int, file_path: str, session: 'AbstractSZZ'):
         """
-        :param Commit commit: commit detected by git blame
+        :param str commit_hash: hash of the commit detected by git blame
         :param int line_num: number of the blamed line
-        :param str line_str: content of the blamed line
         :param str file_path: path of the blamed file
+        :param AbstractSZZ session: SZZ session that blamed the line
         :returns BlameData
         """
-        self.commit = commit
+        self.commit_hash = sys.intern(commit_hash)
         self.line_num = line_num
-        self.line_str = line_str
         self.file_path = file_path
+        self._session = session
+
+    @property
+    def commit(self) -> Commit:
+        """ :returns Commit commit detected by git blame """
+        return self._session._blamed_commit(self.commit_hash)
+
+    @property
+    def line_str(self) -> str:
+        """ :returns str content of the blamed line, stripped """
+        return self._session._get_file_content(self.commit_hash, self.file_path).line(self.line_num).strip()
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}(commit={self.commit.hexsha},line_num={self.line_num},file_path="{self.file_path}",line_str="{self.line_str}")'
+        return f'{self.__class__.__name__}(commit={self.commit_hash},line_num={self.line_num},file_path="{self.file_path}",line_str="{self.line_str}")'
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, self.__class__):
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+from options import Options
+
+
+class CachedBlob:
+    """ Decoded content of a file at a given revision, along with the start offset of each line """
+
+    __slots__ = ('content', '_line_offsets', '_digest')
+
+    def __init__(self, content: str, digest: str = None):
+        """
+        :param str content: decoded file content
+        :param str digest: hash identifying the content (e.g., the git blob hash), computed on first use if not given
+        :returns CachedBlob
+        """
+        self.content = content
+        self._line_offsets = CachedBlob._index_lines(content)
+        self._digest = digest
+
+    @staticmethod
+    def _index_lines(content: str) -> List[int]:
+        offsets = [0]
+        pos = content.find('\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = content.find('\n', pos + 1)
+
+        return offsets
+
+    @property
+    def digest(self) -> str:
+        """ Hash of the content (the git blob hash, or the SHA-1 of the content). Identical contents share the same digest. """
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.content.encode('utf-8', 'surrogatepass')).hexdigest()
+        return self._digest
+
+    @property
+    def line_count(self) -> int:
+        return len(self._line_offsets)
+
+    def line(self, line_num: int) -> str:
+        """
+        Return the content of the given line (1-based), without the line terminator. It is equivalent to
+        content.split('\\n')[line_num - 1], but it does not split the whole content at each call.
+
+        :param int line_num: number of the line
+        :returns str line
+        """
+        if line_num < 1 or line_num > len(self._line_offsets):
+            raise IndexError(f'line {line_num} out of range (1-{len(self._line_offsets)})')
+
+        start = self._line_offsets[line_num - 1]
+        if line_num == len(self._line_offsets):
+            return self.content[start:]
+        return self.content[start:self._line_offsets[line_num] - 1]
+
+    def __len__(self) -> int:
+        return len(self.content)
+
+
+class BlobCache:
+    """
+    Bounded LRU cache of file contents, keyed by (commit, path). Since a commit hash identifies an immutable tree,
+    the cached entries never need to be invalidated. The cache is bounded by the total size of the cached contents,
+    the least recently used entries are evicted first. The cache can be shared among threads: contents are loaded
+    outside of the cache lock, and the threads requesting a content being loaded wait for it instead of loading it
+    again.
+    """
+
+    def __init__(self, loader: Callable[[str, str], CachedBlob], max_bytes: int = Options.BLOB_CACHE_MAX_BYTES):
+        """
+        :param loader: function returning the CachedBlob of a file given a commit hash and a file path
+        :param int max_bytes: maximum total size of the cached contents
+        :returns BlobCache
+        """
+        self.__loader = loader
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        # key -> Future of the contents being loaded
+        self.__loading = dict()
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, commit_hash: str, file_path: str) -> 'CachedBlob':
+        """
+        Return the content of the given file at the given commit, loading it on a cache miss.
+
+        :param str commit_hash: full hash of the commit (symbolic revisions like HEAD must not be used as they can move)
+        :param str file_path: path of the file in the commit tree
+        :returns CachedBlob blob
+        """
+        key = (commit_hash, file_path)
+        with self.__lock:
+            blob = self.__entries.get(key)
+            if blob is not None:
+                self.hits += 1
+                self.__entries.move_to_end(key)
+                return blob
+
+            loading = self.__loading.get(key)
+            if loading is None:
+                self.misses += 1
+                self.__loading[key] = future = Future()
+            else:
+                self.hits += 1
+
+        if loading is not None:
+            return loading.result()
+
+        try:
+            blob = self.__loader(commit_hash, file_path)
+        except BaseException as e:
+            with self.__lock:
+                del self.__loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.__lock:
+            del self.__loading[key]
+            self.__entries[key] = blob
+            self.__size += len(blob)
+            self.__evict()
+        future.set_result(blob)
+
+        return blob
+
+    def __evict(self):
+        # the most recent entry is always kept, even if it exceeds the size limit by itself
+        while self.__size > self.__max_bytes and len(self.__entries) > 1:
+            _, blob = self.__entries.popitem(last=False)
+            self.__size -= len(blob)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    @property
+    def stats(self) -> Tuple[int, int]:
+        """ :returns Tuple[int, int] the count of (hits, misses) """
+        return self.hits, self.misses
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(entries={len(self.__entries)},size={self.__size},hits={self.hits},misses={self.misses})'
@@ -1,25 +1,68 @@
 import logging as log
 import os
 import re
-import subprocess
+from bisect import bisect_right
 from collections import namedtuple
 import tempfile
+from typing import Iterable
+
+from options import Options
+from szz.common.srcml_wrapper import SrcML
+from szz.util import tracing
 
 CommentRange = namedtuple('CommentRange', 'start end')
 srcml_file_ext = ['.c', '.h', '.hh', '.hpp', '.hxx', '.cxx', '.cpp', '.cc', '.cs', '.java']
 
 
+class CommentIndex:
+    """
+    Sorted interval index of the comment lines of a file. Overlapping comment ranges are merged, so that checking
+    whether a line is a comment is a binary search over the range starts.
+    """
+
+    __slots__ = ('_starts', '_ends')
+
+    def __init__(self, comment_ranges: Iterable['CommentRange']):
+        """
+        :param Iterable[CommentRange] comment_ranges: comment ranges returned by parse_comments()
+        :returns CommentIndex
+        """
+        self._starts = list()
+        self._ends = list()
+        for comment_range in sorted(comment_ranges):
+            if self._ends and comment_range.start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], comment_range.end)
+            else:
+                self._starts.append(comment_range.start)
+                self._ends.append(comment_range.end)
+
+    def __contains__(self, line_num: int) -> bool:
+        idx = bisect_right(self._starts, line_num) - 1
+        return idx >= 0 and line_num <= self._ends[idx]
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(zip(self._starts, self._ends))})'
+
+
 def parse_comments(file_str: str, file_name: str, temp_dir: str = tempfile.gettempdir()):
-    if file_name.endswith(".py"):
-        line_comment_ranges = py_comment_parser(file_str, file_name)
-    elif file_name.endswith(".js"):
-        line_comment_ranges = js_comment_parser(file_str, file_name)
-    elif file_name.endswith(".php") or file_name.endswith(".phpt"):
-        line_comment_ranges = php_comment_parser(file_str, file_name)
-    elif file_name.endswith(".rb"):
-        line_comment_ranges = rb_comment_parser(file_str, file_name)
-    else:
-        line_comment_ranges = parse_comments_srcml(file_str, file_name, temp_dir)
+    with tracing.span('parse_comments', file=file_name, size=len(file_str)):
+        if file_name.endswith(".py"):
+            line_comment_ranges = py_comment_parser(file_str, file_name)
+        elif file_name.endswith(".js"):
+            line_comment_ranges = js_comment_parser(file_str, file_name)
+        elif file_name.endswith(".php") or file_name.endswith(".phpt"):
+            line_comment_ranges = php_comment_parser(file_str, file_name)
+        elif file_name.endswith(".rb"):
+            line_comment_ranges = rb_comment_parser(file_str, file_name)
+        elif Options.SRCML_COMMENT_PARSER:
+            line_comment_ranges = parse_comments_srcml(file_str, file_name, temp_dir)
+        elif any(file_name.lower().endswith(e) for e in srcml_file_ext):
+            line_comment_ranges = c_family_comment_parser(file_str, file_name)
+        else:
+            line_comment_ranges = parse_comments_srcml(file_str, file_name, temp_dir)
 
     return line_comment_ranges
 
@@ -28,35 +71,155 @@ def parse_comments_srcml(file_str: str, file_name: str, temp_folder: str = tempf
     line_comment_ranges = list()
 
     if any(file_name.lower().endswith(e) for e in srcml_file_ext):
-        if not os.path.isdir(temp_folder):
-            os.makedirs(temp_folder)
-
-        file_name = os.path.join(temp_folder, 'temp_' + file_name)
-        with open(file_name, 'w') as temp_file:
-            temp_file.write(file_str.encode('utf-8', 'replace').decode('utf-8'))
-
-        process_out = list()
-        p = subprocess.Popen(f'srcml --position {file_name}', shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        for line in p.stdout.readlines():
-            process_out.append(line.decode('utf-8').strip())
-        status = p.wait()
-
-        if status == 0:
-            for line in process_out:
-                if line.strip().startswith("<comment"):
-                    line_comment_ranges.append(CommentRange(start=int(re.search('pos:start="(\d+):', line).groups()[0]),
-                                                            end=int(re.search('pos:end="(\d+):', line).groups()[0])))
-        else:
-            log.error(process_out)
-
-        if os.path.isfile(file_name):
-            os.remove(file_name)
+        # the content is given to srcml through stdin, temp_folder is not used anymore
+        for line in SrcML().parse_file(file_name, file_str).split('\n'):
+            if line.strip().startswith("<comment"):
+                line_comment_ranges.append(CommentRange(start=int(re.search('pos:start="(\d+):', line).groups()[0]),
+                                                        end=int(re.search('pos:end="(\d+):', line).groups()[0])))
     else:
         log.error(f"file not supported by srcML: {file_name}")
 
     return line_comment_ranges
 
 
+def c_family_comment_parser(file_str: str, file_name: str):
+    """
+    Single-pass comment scanner for the C-family languages supported by srcML (C, C++, C# and Java). It skips string
+    and char literals (including C++ raw strings and C# verbatim strings) and follows line continuations in C/C++
+    line comments. It returns the same comment ranges as parse_comments_srcml(), which only reports the comments that
+    start a line (not on the first line, which srcML outputs along with the root element), and ignores the comments
+    in the #if 0 regions of C/C++ files, which srcML does not mark up.
+    """
+    line_comment_ranges = list()
+
+    ext = os.path.splitext(file_name)[1].lower()
+    is_cpp = ext not in ('.cs', '.java')
+    is_csharp = ext == '.cs'
+
+    n = len(file_str)
+    line = 1
+    line_start = 0
+    if0_line = 1 if is_cpp and _CPP_IF0.match(file_str) else 0
+    token = _C_FAMILY_TOKEN.search(file_str)
+    while token:
+        i = token.start()
+        c = file_str[i]
+        end = i + 1
+        if c == '\n':
+            if line == if0_line:
+                # skip the #if 0 region up to the matching #else, #elif or #endif
+                end = _skip_cpp_if0(file_str, end)
+                line += file_str.count('\n', i, end)
+            else:
+                line += 1
+                if is_cpp and _CPP_IF0.match(file_str, end):
+                    if0_line = line
+            line_start = end
+        elif c == '/':
+            start_line = line
+            starts_line = start_line > 1 and (i == line_start or file_str[line_start:i].isspace())
+            if file_str[i + 1] == '/':
+                end = file_str.find('\n', i)
+                # a backslash at the end of a C/C++ line comment continues it on the next line
+                while is_cpp and end != -1 and file_str[line_start:end].rstrip('\r').endswith('\\'):
+                    line += 1
+                    line_start = end + 1
+                    end = file_str.find('\n', line_start)
+                end = n if end == -1 else end
+            else:
+                end = file_str.find('*/', i + 2)
+                end = n if end == -1 else end + 2
+                newlines = file_str.count('\n', i, end)
+                if newlines:
+                    line += newlines
+                    line_start = file_str.rfind('\n', i, end) + 1
+            if starts_line:
+                line_comment_ranges.append(CommentRange(start=start_line, end=line))
+        else:
+            end = _skip_c_family_literal(file_str, i, is_cpp, is_csharp)
+            newlines = file_str.count('\n', i, end)
+            if newlines:
+                line += newlines
+                line_start = file_str.rfind('\n', i, end) + 1
+
+        token = _C_FAMILY_TOKEN.search(file_str, end)
+
+    return line_comment_ranges
+
+
+_C_FAMILY_TOKEN = re.compile(r'//|/\*|["\'\n]')
+_CPP_IF0 = re.compile(r'[ \t\f\v]*#[ \t]*if[ \t]+0(?![\w.])')
+_CPP_DIRECTIVE = re.compile(r'[ \t\f\v]*#[ \t]*(\w+)')
+_CPP_RAW_STRING = re.compile(r'[^ ()\\\t\v\f\n]{0,16}\(')
+
+
+def _skip_cpp_if0(file_str: str, pos: int) -> int:
+    """ Return the start of the line ending the #if 0 region starting at pos """
+    depth = 0
+    while pos < len(file_str):
+        directive = _CPP_DIRECTIVE.match(file_str, pos)
+        if directive:
+            name = directive.group(1)
+            if name in ('if', 'ifdef', 'ifndef'):
+                depth += 1
+            elif name == 'endif' or name in ('else', 'elif') and depth == 0:
+                if depth == 0:
+                    return pos
+                depth -= 1
+
+        next_line = file_str.find('\n', pos)
+        if next_line == -1:
+            return len(file_str)
+        pos = next_line + 1
+
+    return pos
+
+
+def _skip_c_family_literal(file_str: str, pos: int, is_cpp: bool, is_csharp: bool) -> int:
+    """ Return the end of the string or char literal starting at pos. Unterminated literals end at the end of line. """
+    quote = file_str[pos]
+    token_start = pos
+    while token_start > 0 and (file_str[token_start - 1].isalnum() or file_str[token_start - 1] in "_.'"):
+        token_start -= 1
+    prefix = file_str[token_start:pos]
+
+    if quote == "'" and is_cpp and prefix[:1].isdigit():
+        # C++14 digit separator (e.g., 1'000'000)
+        return pos + 1
+    if quote == '"' and is_cpp and prefix in ('R', 'LR', 'uR', 'UR', 'u8R'):
+        # C++11 raw string: R"delimiter( ... )delimiter"
+        delimiter = _CPP_RAW_STRING.match(file_str, pos + 1)
+        if delimiter:
+            closing = ')' + file_str[pos + 1:delimiter.end() - 1] + '"'
+            end = file_str.find(closing, delimiter.end())
+            return len(file_str) if end == -1 else end + len(closing)
+    if quote == '"' and is_csharp and (file_str[pos - 1:pos] == '@' or file_str[pos - 2:pos] == '@$'):
+        # C# verbatim string, where "" is an escaped quote
+        end = pos + 1
+        while True:
+            end = file_str.find('"', end)
+            if end == -1:
+                return len(file_str)
+            if not file_str.startswith('""', end):
+                return end + 1
+            end += 2
+
+    end = pos + 1
+    n = len(file_str)
+    while end < n:
+        c = file_str[end]
+        if c == '\\':
+            end += 2
+        elif c == quote:
+            return end + 1
+        elif c == '\n':
+            return end
+        else:
+            end += 1
+
+    return n
+
+
 def js_comment_parser(file_str, file_name):
     line_comment_ranges = list()
 
@@ -0,0 +1,122 @@
+import logging as log
+import subprocess
+import threading
+from typing import List, Tuple
+
+from git import GitCommandError
+
+
+class GitObjectReader:
+    """
+    Reads git objects through a long-lived 'git cat-file --batch' process, so that each read costs a pipe round-trip
+    instead of spawning a git process. Requests are serialized by a lock, so that the reader can be shared among
+    threads, and the process is restarted if it dies.
+    """
+
+    def __init__(self, repository_path: str):
+        """
+        :param str repository_path: path of the git repository
+        :returns GitObjectReader
+        """
+        self.__repository_path = repository_path
+        self.__lock = threading.Lock()
+        self.__process = None
+
+    def __start(self):
+        self.__process = subprocess.Popen(['git', '-C', self.__repository_path, 'cat-file', '--batch'],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def __stop(self):
+        if self.__process is not None:
+            try:
+                self.__process.stdin.close()
+            except OSError:
+                pass
+            self.__process.kill()
+            self.__process.wait()
+            self.__process.stdout.close()
+            self.__process = None
+
+    def close(self):
+        with self.__lock:
+            self.__stop()
+
+    def read(self, rev_spec: str) -> Tuple[str, bytes]:
+        """
+        Read an object given a revision (e.g., '<commit>:<path>').
+
+        :param str rev_spec: revision of the object
+        :returns Tuple[str, bytes] hash and content of the object
+        """
+        return self.read_many([rev_spec])[0]
+
+    def read_many(self, rev_specs: List[str]) -> List[Tuple[str, bytes]]:
+        """
+        Read several objects with pipelined requests: all the requests are sent before reading the responses.
+
+        :param List[str] rev_specs: revisions of the objects (e.g., '<commit>:<path>')
+        :returns List[Tuple[str, bytes]] hash and content of each object
+        """
+        for spec in rev_specs:
+            if '\n' in spec:
+                raise ValueError(f'invalid revision: {spec!r}')
+
+        with self.__lock:
+            try:
+                return self.__request(rev_specs)
+            except (OSError, ValueError) as e:
+                # the process died (e.g., killed or broken pipe): retry once with a new process
+                log.warning(f'restarting git cat-file for {self.__repository_path}: {e}')
+                self.__stop()
+                return self.__request(rev_specs)
+
+    def __request(self, rev_specs: List[str]) -> List[Tuple[str, bytes]]:
+        if self.__process is None or self.__process.poll() is not None:
+            self.__start()
+        process = self.__process
+
+        requests = ''.join(f'{spec}\n' for spec in rev_specs).encode('utf-8', 'surrogateescape')
+        if len(rev_specs) > 1:
+            # a writer thread avoids a deadlock when the responses fill the pipe before all the requests are sent
+            writer = threading.Thread(target=GitObjectReader.__write, args=(process, requests), daemon=True)
+            writer.start()
+        else:
+            writer = None
+            GitObjectReader.__write(process, requests)
+
+        objects = list()
+        errors = list()
+        for spec in rev_specs:
+            header = process.stdout.readline()
+            if not header:
+                raise ValueError('unexpected end of git cat-file output')
+
+            if header.rstrip().endswith((b' missing', b' ambiguous')):
+                # '<spec> missing' or '<spec> ambiguous', where the spec can contain spaces
+                errors.append(header.decode('utf-8', 'replace').strip())
+                objects.append(None)
+                continue
+
+            # '<hash> <type> <size>'
+            fields = header.split()
+            size = int(fields[2])
+            content = process.stdout.read(size + 1)[:-1]  # the content is followed by a newline
+            if len(content) != size:
+                raise ValueError('unexpected end of git cat-file output')
+            objects.append((fields[0].decode(), content))
+
+        if writer is not None:
+            writer.join()
+
+        if errors:
+            raise GitCommandError(['git', 'cat-file', '--batch'], 128, '\n'.join(errors))
+
+        return objects
+
+    @staticmethod
+    def __write(process: subprocess.Popen, requests: bytes):
+        process.stdin.write(requests)
+        process.stdin.flush()
+
+    def __del__(self):
+        self.__stop()
@@ -1,11 +1,24 @@
+import io
 import logging as log
-from typing import Set, Dict, List
+from typing import Set, Dict, List, Optional
 
-from bs4 import BeautifulSoup
-from bs4.element import Tag
+from lxml import etree
+
+# srcML position attribute (--position), e.g. pos:end="12:5"
+POS_END = '{http://www.srcML.org/srcML/position}end'
 
 
 class DefUseParser:
+    """
+    Define-Use chains builder working on the lxml tree of a srcML AST. The XML is parsed incrementally, one top-level
+    function at a time, so that the memory used does not depend on the size of the file.
+
+    The chains are built the same way as the previous BeautifulSoup based parser, including its side effects on the
+    tree: struct member names (e.g. person.salary) are collapsed into a single name node, and an expression is
+    visited again when one of its nodes is collapsed after it has been visited. These tree changes are kept in
+    overlays instead of modifying the lxml tree.
+    """
+
     ASSIGN_OP = ['=', '*=', '/=', '%=', '+=', '-=', '&=', '^=', '|=', '<<=', '>>=']
     PREFIX_OP = ['++', '--']
     TAG_TO_PARSE = ['decl', 'expr']
@@ -16,8 +29,13 @@ class DefUseParser:
         self.__def_lines = dict()  # line_id -> var_name
         self.__defuse_chain = dict()  # def_line_num -> list of use_line_num
 
+        # tree overlays, shared by the nested functions of a top-level function
+        self.__strings = dict()  # collapsed node -> name string
+        self.__detached = set()  # children of the collapsed nodes, which have no parent anymore
+        self.__versions = dict()  # node -> count of collapsed nodes in its subtree
+
     def __add_define(self, element):
-        var_name = element.string
+        var_name = self.__string(element)
         if var_name:
             line_num = DefUseParser.parse_line_num(element)
             elem_id = DefUseParser.get_line_id(var_name, line_num)
@@ -25,33 +43,33 @@ class DefUseParser:
             self.__def_lines[elem_id] = var_name
             self.__defuse_chain[elem_id] = set()
         else:
-            log.warning(f'skip invalid define node: {element}')
+            log.warning(f'skip invalid define node: {DefUseParser.__to_string(element)}')
 
     def __add_use(self, element) -> bool:
         try:
-            var_name = element.string
+            var_name = self.__string(element)
             if var_name:
                 line_num = DefUseParser.parse_line_num(element)
                 chain = self.__defuse_chain[self.__defs[var_name]]
                 chain.add(line_num)
                 self.__defuse_chain[self.__defs[var_name]] = chain
             else:
-                log.warning(f'skip invalid use node: {element}')
+                log.warning(f'skip invalid use node: {DefUseParser.__to_string(element)}')
 
             return True
         except KeyError:
             return False
 
     def __parse_struct(self, element):
-        n_children = element.findChildren(recursive=False)
+        n_children = self.__children(element)
         for j in range(len(n_children)):
             c = DefUseParser.safe_list_get(n_children, j, None)
             c_prev = DefUseParser.safe_list_get(n_children, j-1, None)
             c_next = DefUseParser.safe_list_get(n_children, j+1, None)
-            if c and c.name == 'operator' and c.string in DefUseParser.STRUCT_OP \
-                    and c_prev and c_prev.name == 'name' \
-                    and c_next and c_next.name == 'name':
-                element.string = c_prev.string + c.string + c_next.string
+            if c is not None and local_name(c) == 'operator' and self.__string(c) in DefUseParser.STRUCT_OP \
+                    and c_prev is not None and local_name(c_prev) == 'name' \
+                    and c_next is not None and local_name(c_next) == 'name':
+                self.__set_string(element, self.__string(c_prev) + self.__string(c) + self.__string(c_next))
 
         return element
 
@@ -61,25 +79,45 @@ class DefUseParser:
         """
         duc = list()
 
-        # Parse XML from a file object
-        soup = BeautifulSoup(ast_xml, features="lxml-xml")
-        function_xml = soup.find_all("function")
-        for f in function_xml:  # for each function
-            duc_data_raw = self.__process_functions(f)
+        if not ast_xml:
+            return duc
 
-            if raw_output:
-                duc_data = duc_data_raw
-            else:
-                duc_data = duc_data_raw.defuse_chain
+        depth = 0
+        source = io.BytesIO(ast_xml.encode('utf-8'))
+        for event, element in etree.iterparse(source, events=('start', 'end'), tag='{*}function', recover=True, huge_tree=True):
+            if event == 'start':
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth > 0:
+                # nested functions are processed along with the top-level function
+                continue
 
-            duc.append(duc_data)
+            self.__strings.clear()
+            self.__detached.clear()
+            self.__versions.clear()
+            for f in element.iter('{*}function'):  # for each function, in document order
+                duc_data_raw = self.__process_functions(f)
+
+                if raw_output:
+                    duc_data = duc_data_raw
+                else:
+                    duc_data = duc_data_raw.defuse_chain
+
+                duc.append(duc_data)
+
+            # free the processed functions
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
 
         return duc
 
-    def __process_functions(self, function_ast: Tag) -> 'DefUseData':
+    def __process_functions(self, function_ast) -> 'DefUseData':
         """
-        Build Define-Use chains from a function of an AST created with srcML. The xml will be loaded into
-        BeautifulSoup first.
+        Build Define-Use chains from a function of an AST created with srcML.
 
         :param function_ast: srcML AST
 
@@ -88,22 +126,25 @@ class DefUseParser:
             *defuse_chain* = def_line_num -> list of use_line_num*, define-use chain found for each variable in defs.
         """
 
-        self.__init__()
+        self.__defs = dict()
+        self.__def_lines = dict()
+        self.__defuse_chain = dict()
 
         # define nodes currently visited but not yet used by current variables (in current line). They will be added when
         # processing the next statement
         pending_define_nodes = list()
         pending_use_nodes = list()
 
-        visited = set()
+        visited = dict()  # node -> version of the node when visited
 
-        names = function_ast.find_all('name')  # find all variable names
+        names = self.__find_names(function_ast)  # find all variable names
         for name in names:
-            n_parent = name.parent  # find each parent node
+            n_parent = self.__parent(name)  # find each parent node
 
-            if n_parent and n_parent not in visited and n_parent.name in DefUseParser.TAG_TO_PARSE:
-                visited.add(n_parent)
-                p_children = n_parent.findChildren(recursive=False)  # find each child node containing variables
+            if n_parent is not None and local_name(n_parent) in DefUseParser.TAG_TO_PARSE \
+                    and visited.get(n_parent) != self.__versions.get(n_parent, 0):
+                visited[n_parent] = self.__versions.get(n_parent, 0)
+                p_children = self.__children(n_parent)  # find each child node containing variables
 
                 # check if statement is changed to add pending use and define nodes
                 if pending_define_nodes and p_children and DefUseParser.parse_line_num(pending_define_nodes[-1]) != DefUseParser.parse_line_num(p_children[-1]):
@@ -114,23 +155,24 @@ class DefUseParser:
                         self.__add_use(u)
                     pending_use_nodes = list()
 
+                parent_name = local_name(n_parent)
                 for i in range(len(p_children)):
                     node = p_children[i]
                     n_prev = DefUseParser.safe_list_get(p_children, i-1, None)
                     n_next = DefUseParser.safe_list_get(p_children, i+1, None)
 
-                    if not node.string:
+                    if not self.__string(node):
                         node = self.__parse_struct(node)
 
-                    if node.name == 'name':  # check if is a variable
-                        if node.parent.name == 'decl':  # parse declaration statements
+                    if local_name(node) == 'name':  # check if is a variable
+                        if parent_name == 'decl':  # parse declaration statements
                             pending_define_nodes.append(node)
-                        elif node.parent.name == 'expr':  # parse expression statements
+                        elif parent_name == 'expr':  # parse expression statements
                             # Check if is an assignment (re-define).
                             # case 1 - postfix operation: "int a = a + b;" or else "a++;"
                             # case 2 - prefix operation: "++a;"
-                            if n_next and n_next.name == 'operator' and n_next.string in DefUseParser.ASSIGN_OP or \
-                                    n_prev and n_prev.name == 'operator' and n_prev.string in DefUseParser.PREFIX_OP:
+                            if n_next is not None and local_name(n_next) == 'operator' and self.__string(n_next) in DefUseParser.ASSIGN_OP or \
+                                    n_prev is not None and local_name(n_prev) == 'operator' and self.__string(n_prev) in DefUseParser.PREFIX_OP:
                                 pending_define_nodes.append(node)
                             else:
                                 res = self.__add_use(node)
@@ -148,6 +190,72 @@ class DefUseParser:
 
         return DefUseData(self.__def_lines, self.__defuse_chain)
 
+    def __find_names(self, function_ast) -> List:
+        """ Return the name nodes of a function in document order, skipping the subtrees of collapsed nodes """
+        if not self.__detached:
+            return [n for n in function_ast.iter('{*}name') if n is not function_ast]
+
+        names = list()
+        stack = list(reversed(self.__children(function_ast)))
+        while stack:
+            node = stack.pop()
+            if local_name(node) == 'name':
+                names.append(node)
+            stack.extend(reversed(self.__children(node)))
+
+        return names
+
+    def __parent(self, element):
+        if element in self.__detached:
+            return None
+        return element.getparent()
+
+    def __children(self, element) -> List:
+        """ Return the child elements of a node (none for collapsed nodes) """
+        if element in self.__strings:
+            return list()
+        return [c for c in element if isinstance(c.tag, str)]
+
+    def __string(self, element) -> Optional[str]:
+        """
+        Return the string of a node having a single child, which is either a string or a node having a string itself
+        (like bs4 Tag.string), otherwise None
+        """
+        while True:
+            if element in self.__strings:
+                return self.__strings[element]
+
+            count = len(element)
+            if element.text:
+                count += 1
+            for child in element:
+                if child.tail:
+                    count += 1
+            if count != 1:
+                return None
+
+            if element.text:
+                return element.text
+            element = element[0]
+            if not isinstance(element.tag, str):
+                # comment or processing instruction
+                return element.text
+
+    def __set_string(self, element, string: str):
+        """ Collapse a node into a string, detaching its children (like setting bs4 Tag.string) """
+        self.__detached.update(self.__children(element))
+        self.__strings[element] = string
+
+        # the node and its ancestors are changed, so they are visited again
+        node = element
+        while node is not None:
+            self.__versions[node] = self.__versions.get(node, 0) + 1
+            node = self.__parent(node)
+
+    @staticmethod
+    def __to_string(element) -> str:
+        return etree.tostring(element, encoding='unicode', with_tail=False)
+
     @staticmethod
     def safe_list_get(lst, idx, default):
         try:
@@ -158,7 +266,7 @@ class DefUseParser:
     @staticmethod
     def parse_line_num(element):
         try:
-            return int(element.attrs.get("pos:end", None).split(':')[0])
+            return int(element.get(POS_END, None).split(':')[0])
         except AttributeError:
             return None
 
@@ -167,7 +275,12 @@ class DefUseParser:
         return f"{name}:{line_num}"
 
 
+def local_name(element) -> str:
+    """ Return the tag name of a srcML node without its namespace """
+    return element.tag.rpartition('}')[2]
+
+
 class DefUseData:
     def __init__(self, def_lines:  Dict[int, str], defuse_chain:  Dict[int, Set]):
         self.def_lines = def_lines
-        self.defuse_chain = defuse_chain
\ No newline at end of file
+        self.defuse_chain = defuse_chain
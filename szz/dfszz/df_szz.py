@@ -3,7 +3,6 @@ import os
 import traceback
 from typing import List, Dict, Set
 
-import networkx as nx
 from git import Commit
 
 from szz.core.abstract_szz import ImpactedFile, LineChangeType, DetectLineMoved
@@ -11,6 +10,7 @@ from szz.dfszz.define_use_parser import DefUseParser
 from szz.ma_szz import MASZZ
 from szz.r_szz import RSZZ
 from szz.common.srcml_wrapper import SrcML
+from szz.util import tracing
 
 SUPPORTED_FILE_EXT = ['.c', '.h']
 
@@ -23,6 +23,7 @@ class DFSZZ(MASZZ):
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
+    @tracing.traced()
     def start(self, fix_commit_hash: str, commit_issue_date, **kwargs) -> Set[Commit]:
         file_ext_to_parse = kwargs.get('file_ext_to_parse')
         only_deleted_lines = False
@@ -87,18 +88,22 @@ class DFSZZ(MASZZ):
 
         def_use_imp_files = list()
 
+        files_to_parse = list()
         for imp_file in impacted_files:
             if imp_file.line_change_type == LineChangeType.ADD:
                 if not os.path.splitext(imp_file.file_path)[-1] in SUPPORTED_FILE_EXT:
                     log.warning(f"skip file not supported by define-use chains parser: {imp_file.file_path}")
                     continue
+                files_to_parse.append(imp_file)
 
-                source_file_content = self.repository.git.show(f"{fix_commit_hash}:{imp_file.file_path}")
-                ast_xml = SrcML().parse_file(imp_file.file_path, source_file_content)
-                lines_to_blame = self._select_def_use_lines(imp_file, ast_xml, cutoff_distance)
-                log.info(f"added lines to blame={lines_to_blame} for file={imp_file.file_path}")
-                if lines_to_blame:
-                    def_use_imp_files.append(ImpactedFile(imp_file.file_path, list(lines_to_blame), None))
+        # all the impacted files are parsed with a single srcml run
+        ast_xmls = SrcML().parse_files([(imp_file.file_path, self._get_impacted_file_content(fix_commit_hash, imp_file))
+                                        for imp_file in files_to_parse])
+        for imp_file, ast_xml in zip(files_to_parse, ast_xmls):
+            lines_to_blame = self._select_def_use_lines(imp_file, ast_xml, cutoff_distance)
+            log.info(f"added lines to blame={lines_to_blame} for file={imp_file.file_path}")
+            if lines_to_blame:
+                def_use_imp_files.append(ImpactedFile(imp_file.file_path, list(lines_to_blame), None))
 
         log.info(f"impacted_files_ext={def_use_imp_files}")
 
@@ -137,18 +142,59 @@ class DFSZZ(MASZZ):
         :return Set of selected neighbor_lines
         """
 
-        neighbor_lines = set()
-        G = DFSZZ.build_def_use_graph(def_use_chains)
-
-        nodes = list(G.nodes)
-        for i in range(len(nodes)):
-            if nodes[i] in modified_lines:
-                neighbor_lines.update(DFSZZ.select_neighbor_nodes(G, nodes[i], distance_radius))
+        adjacency = DFSZZ.build_def_use_adjacency(def_use_chains)
+        sources = {n for n in modified_lines if n in adjacency}
+        neighbor_lines = DFSZZ.select_neighbor_lines(adjacency, sources, distance_radius)
+        if neighbor_lines:
+            log.info(f'neighbors={sorted(neighbor_lines)}')
 
         return neighbor_lines
 
     @staticmethod
-    def build_def_use_graph(def_use_chains: Dict[str, List[int]]) -> nx.DiGraph:
+    def build_def_use_adjacency(def_use_chains: Dict[str, List[int]]) -> Dict[int, Set[int]]:
+        """
+        Build the def-use graph as a line -> successor lines adjacency, with the same nodes and edges of
+        build_def_use_graph(): an edge from each define line to its use lines, without self-loops.
+        """
+        adjacency = dict()
+        for k, uses in def_use_chains.items():
+            def_line = int(k.split(':')[1])
+            successors = adjacency.setdefault(def_line, set())
+            for v in uses:
+                adjacency.setdefault(v, set())
+                if v != def_line:
+                    successors.add(v)
+
+        return adjacency
+
+    @staticmethod
+    def select_neighbor_lines(adjacency: Dict[int, Set[int]], sources: Set[int], distance_radius: int) -> Set:
+        """
+        Select the union of the neighbors of the source nodes with a single breadth-first search, i.e. the union of
+        select_neighbor_nodes() for each source node: the nodes reachable within distance_radius (1 if 0) from a
+        source, except the source itself. A source is selected only if it is reachable from another source, so each
+        node keeps the first two distinct sources reaching it.
+        """
+        radius = distance_radius if distance_radius > 0 else 1
+
+        origins = {n: [n] for n in sources}
+        frontier = [(n, n) for n in sources]
+        for _ in range(radius):
+            next_frontier = list()
+            for node, origin in frontier:
+                for successor in adjacency[node]:
+                    successor_origins = origins.setdefault(successor, list())
+                    if len(successor_origins) < 2 and origin not in successor_origins:
+                        successor_origins.append(origin)
+                        next_frontier.append((successor, origin))
+            frontier = next_frontier
+
+        return {n for n, node_origins in origins.items() if n not in sources or len(node_origins) > 1}
+
+    @staticmethod
+    def build_def_use_graph(def_use_chains: Dict[str, List[int]]) -> 'nx.DiGraph':
+        import networkx as nx
+
         edges = set()
         for k in def_use_chains.keys():
             def_line = int(k.split(':')[1])
@@ -162,7 +208,9 @@ class DFSZZ(MASZZ):
         return G
 
     @staticmethod
-    def select_neighbor_nodes(G: nx.DiGraph, node, distance_radius: int) -> Set:
+    def select_neighbor_nodes(G: 'nx.DiGraph', node, distance_radius: int) -> Set:
+        import networkx as nx
+
         neighbor_lines = set()
 
         if distance_radius > 0:
@@ -0,0 +1,89 @@
+import logging as log
+from typing import Dict, List, Set
+
+from git import Commit
+
+from szz.common.issue_date import filter_by_date
+from szz.core.abstract_szz import ImpactedFile
+from szz.l_szz import LSZZ
+from szz.ma_szz import MASZZ
+from szz.r_szz import RSZZ
+from szz.util import tracing
+
+ISSUE_DATE_FILTER_SUFFIX = '_issues_filter'
+
+
+class FanOutSZZ(LSZZ):
+    """
+    Fan-out of the SZZ variants sharing the MA-SZZ candidates. R-SZZ and L-SZZ only select a commit among the MA-SZZ
+    candidates, so the candidates are computed once per fix commit and each requested variant is derived from them:
+
+    * ma = MA-SZZ candidates;
+    * r = the latest candidate (R-SZZ);
+    * l = the candidate with the most modified lines (L-SZZ);
+    * <variant>_issues_filter = the same variant, applied to the candidates filtered by issue date.
+
+    The results are the same as running each variant on its own.
+    """
+
+    VARIANTS = ['ma', 'r', 'l']
+
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
+        super().__init__(repo_full_name, repo_url, repos_dir)
+
+    @staticmethod
+    def is_valid_variant(variant: str) -> bool:
+        if variant.endswith(ISSUE_DATE_FILTER_SUFFIX):
+            variant = variant[:-len(ISSUE_DATE_FILTER_SUFFIX)]
+        return variant in FanOutSZZ.VARIANTS
+
+    @staticmethod
+    def uses_issue_date(variants: List[str]) -> bool:
+        return any(variant.endswith(ISSUE_DATE_FILTER_SUFFIX) for variant in variants)
+
+    def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
+        """ Find the MA-SZZ bug introducing commits candidates (see MASZZ.find_bic()) """
+        return MASZZ.find_bic(self, fix_commit_hash, impacted_files, **kwargs)
+
+    @tracing.traced()
+    def find_bic_variants(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], variants: List[str], **kwargs) -> Dict[str, Set[Commit]]:
+        """
+        Find the bug introducing commits of the given variants, computing the MA-SZZ candidates only once.
+
+        :param str fix_commit_hash: hash of fix commit to scan for buggy commits
+        :param List[ImpactedFile] impacted_files: list of impacted files in fix commit
+        :param List[str] variants: variants to compute (e.g., ['ma', 'r', 'l', 'r_issues_filter'])
+        :param **kwargs: parameters of MASZZ.find_bic(), issue_date is required by the *_issues_filter variants
+        :returns Dict[str, Set[Commit]] the bug introducing commits of each variant
+        """
+        kwargs['issue_date_filter'] = False
+        candidates = self.find_bic(fix_commit_hash, impacted_files, **kwargs)
+
+        filtered_candidates = None
+        selections = dict()
+        results = dict()
+        for variant in variants:
+            bic = candidates
+            selection = variant
+            if variant.endswith(ISSUE_DATE_FILTER_SUFFIX):
+                if filtered_candidates is None:
+                    filtered_candidates = filter_by_date(candidates, kwargs['issue_date'])
+                bic = filtered_candidates
+                selection = variant[:-len(ISSUE_DATE_FILTER_SUFFIX)]
+
+            if selection != 'ma':
+                # the same candidates can be shared by several variants (e.g., all candidates are older than the issue)
+                key = (selection, frozenset(c.hexsha for c in bic))
+                if key not in selections:
+                    if selection == 'r':
+                        selections[key] = {RSZZ.select_latest_commit(bic)}
+                    elif selection == 'l':
+                        selections[key] = {self.select_largest_commit(bic)}
+                    else:
+                        raise ValueError(f'invalid variant: {variant}')
+                bic = selections[key]
+
+            log.info(f"{variant} result: {bic}")
+            results[variant] = bic
+
+        return results
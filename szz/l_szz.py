@@ -2,9 +2,10 @@ import logging as log
 from typing import List, Set
 
 from git import Commit
-from pydriller.metrics.process.lines_count import LinesCount
+from szz.common.commit_index import CommitIndex
 from szz.core.abstract_szz import ImpactedFile
 from szz.ma_szz import MASZZ
+from szz.util import tracing
 
 
 class LSZZ(MASZZ):
@@ -23,6 +24,7 @@ class LSZZ(MASZZ):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
     # TODO: add parse and type check on kwargs
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
         Find bug introducing commits candidates selecting the ones having the highest number of modified lines.
@@ -33,13 +35,15 @@ class LSZZ(MASZZ):
         return {self.select_largest_commit(bic_candidates)}
 
     def select_largest_commit(self, bic_candidates: Set[Commit]) -> Commit:
+        return LSZZ.select_largest_commit_in_index(self.commit_index, bic_candidates)
+
+    @staticmethod
+    def select_largest_commit_in_index(commit_index: 'CommitIndex', bic_candidates: Set[Commit]) -> Commit:
+        """ Select the candidate having the most modified lines, as counted by the given commit index """
         bic_candidate = None
         max_mod_lines = 0
         for commit in bic_candidates:
-            lc = LinesCount(path_to_repo=self.repository_path, from_commit=commit.hexsha, to_commit=commit.hexsha).count()
-            mod_lines_count = 0
-            for k in lc.keys():
-                mod_lines_count += lc.get(k)
+            mod_lines_count = commit_index.lines_changed(commit.hexsha)
 
             if mod_lines_count > max_mod_lines:
                 max_mod_lines = mod_lines_count
@@ -1,11 +1,15 @@
 import logging as log
-from typing import List, Set
+from typing import TYPE_CHECKING, List, Set
 from time import time as ts
 from git import Commit
-from pydriller import RepositoryMining, ModificationType
+from szz.common.commit_index import MODE_CHANGE, RENAME
 from szz.common.issue_date import filter_by_date
 from szz.ag_szz import AGSZZ
 from szz.core.abstract_szz import ImpactedFile, DetectLineMoved
+from szz.util import tracing
+
+if TYPE_CHECKING:
+    from pydriller import ModificationType
 
 
 class MASZZ(AGSZZ):
@@ -23,23 +27,65 @@ class MASZZ(AGSZZ):
 
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
-        self.__changes_to_ignore = [
-            ModificationType.RENAME,
-            ModificationType.COPY
-        ]
+        # None stands for the default change types (renames and copies), so that pydriller is imported only when the
+        # change types are read or customized
+        self.__changes_to_ignore = None
 
     @property
-    def change_types_to_ignore(self) -> List[ModificationType]:
+    def change_types_to_ignore(self) -> List['ModificationType']:
+        if self.__changes_to_ignore is None:
+            from pydriller import ModificationType
+
+            self.__changes_to_ignore = [
+                ModificationType.RENAME,
+                ModificationType.COPY
+            ]
         return self.__changes_to_ignore
 
     @change_types_to_ignore.setter
-    def change_types_to_ignore(self, changes_to_ignore: List[ModificationType]):
+    def change_types_to_ignore(self, changes_to_ignore: List['ModificationType']):
         self.__changes_to_ignore = changes_to_ignore
 
+    def __change_type_names(self) -> Set[str]:
+        if self.__changes_to_ignore is None:
+            return {'RENAME', 'COPY'}
+        return {change_type.name for change_type in self.__changes_to_ignore}
+
+    @tracing.traced('meta_changes')
+    def select_meta_changes(self, commit_hash: str, current_file: str, filter_revert: bool = False) -> Set[str]:
+        meta_changes = set()
+        change_types = self.__change_type_names()
+        if change_types - {'RENAME', 'COPY'}:
+            # the commit index records only renames and mode changes, other change types need the commit diff
+            return self.__select_meta_changes_from_diff(commit_hash, current_file, filter_revert)
+
+        commit = self.commit_index.get(commit_hash)
+        # ignore revert commits
+        if filter_revert and commit.is_revert:
+            log.info(f'exclude meta-change (Revert commit): {current_file} {commit.hash}')
+            meta_changes.add(commit.hash)
+            return meta_changes
+
+        path_changes = self.commit_index.path_changes(commit_hash)
+        # as in the 'mode change' lines of 'git show --summary', the file matches any path containing it
+        if any(change.change == MODE_CHANGE and current_file in change.new_path for change in path_changes):
+            log.info(f'exclude meta-change (file mode change): {current_file} {commit.hash}')
+            meta_changes.add(commit.hash)
+        elif 'RENAME' in change_types:
+            # copies are never reported, as commit diffs are computed with rename detection only (like PyDriller)
+            for change in path_changes:
+                if change.change == RENAME and current_file in (change.new_path, change.old_path):
+                    log.info(f'exclude meta-change (ModificationType.RENAME): {current_file} {commit.hash}')
+                    meta_changes.add(commit.hash)
+
+        return meta_changes
+
     def _is_git_mode_change(self, git_show_output: List[str], current_file: str):
         return any(line.strip().startswith('mode change') and current_file in line for line in git_show_output)
 
-    def select_meta_changes(self, commit_hash: str, current_file: str, filter_revert: bool = False) -> Set[str]:
+    def __select_meta_changes_from_diff(self, commit_hash: str, current_file: str, filter_revert: bool = False) -> Set[str]:
+        from pydriller import RepositoryMining
+
         meta_changes = set()
         repo_mining = RepositoryMining(path_to_repo=self.repository_path, single=commit_hash).traverse_commits()
         for commit in repo_mining:
@@ -66,19 +112,15 @@ class MASZZ(AGSZZ):
 
     def get_merge_commits(self, commit_hash: str) -> Set[str]:
         merge = set()
-        repo_mining = RepositoryMining(single=commit_hash, path_to_repo=self.repository_path).traverse_commits()
-        for commit in repo_mining:
-            try:
-                if commit.merge:
-                    merge.add(commit.hash)
-            except Exception as e:
-                log.error(f'unable to analyze commit: {self.repository_path} {commit.hash}')
+        if self.commit_index.get(commit_hash).is_merge:
+            merge.add(commit_hash)
 
         if len(merge) > 0:
             log.info(f'merge commits count: {len(merge)}')
 
         return merge
 
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
         Find bug introducing commits candidates.
@@ -112,23 +154,33 @@ class MASZZ(AGSZZ):
         blame_data = list()
         commits_to_ignore = set()
         commits_to_ignore_current_file = set()
+        change_size_exclusions = dict()  # commit hash -> commits excluded by change size
+        merge_commits = dict()  # commit hash -> merge commits to exclude
+        meta_changes = dict()  # (commit hash, file path) -> meta-changes to exclude
         bic = set()
         for imp_file in impacted_files:
             commits_to_ignore_current_file = commits_to_ignore.copy()
 
             to_blame = True
+            line_blames = dict() if self.INCREMENTAL_REBLAME else None
+            reblame_commits = set()
             while to_blame:
                 log.info(f"excluding commits: {params['ignore_revs_list']}")
-                blame_data = self._ag_annotate([imp_file], **params)
+                blame_data = self._ag_annotate([imp_file], line_blames=line_blames, reblame_commits=reblame_commits, **params)
+                blamed_ignore_revs = set(params['ignore_revs_list'])
 
                 new_commits_to_ignore = set()
                 new_commits_to_ignore_current_file = set()
                 for bd in blame_data:
-                    if bd.commit.hexsha not in new_commits_to_ignore and bd.commit.hexsha not in new_commits_to_ignore_current_file:
-                        if bd.commit.hexsha not in commits_to_ignore_current_file:
-                            new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size=max_change_size))
-                            new_commits_to_ignore.update(self.get_merge_commits(bd.commit.hexsha))
-                            new_commits_to_ignore_current_file.update(self.select_meta_changes(bd.commit.hexsha, bd.file_path, filter_revert))
+                    if bd.commit_hash not in new_commits_to_ignore and bd.commit_hash not in new_commits_to_ignore_current_file:
+                        if bd.commit_hash not in commits_to_ignore_current_file:
+                            new_commits_to_ignore.update(self._change_size_exclusions(bd.commit_hash, max_change_size, change_size_exclusions))
+                            if bd.commit_hash not in merge_commits:
+                                merge_commits[bd.commit_hash] = self.get_merge_commits(bd.commit_hash)
+                            new_commits_to_ignore.update(merge_commits[bd.commit_hash])
+                            if (bd.commit_hash, bd.file_path) not in meta_changes:
+                                meta_changes[(bd.commit_hash, bd.file_path)] = self.select_meta_changes(bd.commit_hash, bd.file_path, filter_revert)
+                            new_commits_to_ignore_current_file.update(meta_changes[(bd.commit_hash, bd.file_path)])
 
                 if len(new_commits_to_ignore) == 0 and len(new_commits_to_ignore_current_file) == 0:
                     to_blame = False
@@ -141,7 +193,13 @@ class MASZZ(AGSZZ):
                 commits_to_ignore_current_file.update(new_commits_to_ignore_current_file)
                 params['ignore_revs_list'] = list(commits_to_ignore_current_file)
 
-            bic.update({bd.commit for bd in blame_data if bd.commit.hexsha not in self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size)})
+                reblame_commits = commits_to_ignore_current_file - blamed_ignore_revs
+                if line_blames is not None and not blamed_ignore_revs.issubset(commits_to_ignore_current_file):
+                    # the first blame of a file ignores the commits of the previous file, which may not be ignored
+                    # anymore: the whole file is blamed again
+                    line_blames.clear()
+
+            bic.update({self._blamed_commit(bd.commit_hash) for bd in blame_data if bd.commit_hash not in self._change_size_exclusions(bd.commit_hash, max_change_size, change_size_exclusions)})
 
         if kwargs.get('issue_date_filter', False):
             bic = filter_by_date(bic, kwargs['issue_date'])
@@ -1,9 +1,9 @@
 import logging as log
 from typing import List, Set
 from git import Commit
-from pydriller import GitRepository
 from szz.common.issue_date import filter_by_date
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.util import tracing
 
 
 def match_files(file: str, impacted_files: List['ImpactedFile']) -> bool:
@@ -29,6 +29,7 @@ class PyDrillerSZZ(AbstractSZZ):
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
         Find bug introducing commits candidates.
@@ -45,6 +46,8 @@ class PyDrillerSZZ(AbstractSZZ):
 
         bug_introd_commits = set()
 
+        from pydriller import GitRepository
+
         gr = GitRepository(self.repository_path)
         pydriller_fix_commit = gr.get_commit(fix_commit_hash)
         for mod in pydriller_fix_commit.modifications:
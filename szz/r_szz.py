@@ -6,6 +6,7 @@ from git import Commit
 
 from szz.core.abstract_szz import ImpactedFile
 from szz.ma_szz import MASZZ
+from szz.util import tracing
 
 
 class RSZZ(MASZZ):
@@ -24,6 +25,7 @@ class RSZZ(MASZZ):
         super().__init__(repo_full_name, repo_url, repos_dir)
 
     # TODO: add parse and type check on kwargs
+    @tracing.traced()
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         bic_candidates = super().find_bic(fix_commit_hash, impacted_files, **kwargs)
 
@@ -1,12 +1,17 @@
 import json
 import logging as log
 import os
-import tempfile
-from typing import List, Set
+import subprocess
+from typing import Dict, List, Set
 
 from options import Options
+from szz.common.refactoring_cache import RefactoringCache
 from szz.ma_szz import MASZZ
 from szz.core.abstract_szz import ImpactedFile, BlameData, DetectLineMoved
+from szz.util import tracing
+
+REFMINER_VERSION = '2.0'
+PATH_TO_REFMINER = os.path.join(Options.PYSZZ_HOME, f'tools/RefactoringMiner-{REFMINER_VERSION}/bin/RefactoringMiner')
 
 
 class RASZZ(MASZZ):
@@ -22,22 +27,80 @@ class RASZZ(MASZZ):
     todo:
     """
 
+    # _blame() filters and re-blames the refactoring lines, so the files are blamed again as a whole at each iteration
+    INCREMENTAL_REBLAME = False
+
     def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
         super().__init__(repo_full_name, repo_url, repos_dir)
-
-    def _extract_refactorings(self, commits):
-        PATH_TO_REFMINER = os.path.join(Options.PYSZZ_HOME, 'tools/RefactoringMiner-2.0/bin/RefactoringMiner')
-
+        self._refactoring_cache = RefactoringCache()
+
+    def close(self):
+        super().close()
+        if hasattr(self, '_refactoring_cache'):
+            self._refactoring_cache.close()
+
+    def _extract_refactorings(self, commits) -> Dict[str, Dict]:
+        """
+        Return the RefactoringMiner results of the given commits. The results are read from the persistent
+        refactoring cache, and the missing ones are mined in a single RefactoringMiner run when possible.
+        """
         refactorings = dict()
+        to_mine = list()
         for commit in commits:
-            if not commit in refactorings:
-                with tempfile.NamedTemporaryFile(mode='r+') as tmpfile:
+            if commit not in refactorings and commit not in to_mine:
+                cached = self._refactoring_cache.get(self._repo_full_name, commit, REFMINER_VERSION)
+                if cached is not None:
+                    refactorings[commit] = cached
+                else:
+                    to_mine.append(commit)
+
+        with tracing.span('refminer', cached=len(refactorings), to_mine=len(to_mine)):
+            if len(to_mine) > 1:
+                mined = self.__run_refminer_between_commits(to_mine)
+                self._refactoring_cache.put_all(self._repo_full_name, mined, REFMINER_VERSION)
+                refactorings.update({commit: mined[commit] for commit in to_mine if commit in mined})
+
+            for commit in to_mine:
+                if commit not in refactorings:
                     log.info(f'Running RefMiner on {commit}')
-                    os.system(f'"{PATH_TO_REFMINER}" -c "{self._repository_path}" {commit} > {tmpfile.name}')
-                    refactorings[commit] = json.loads(tmpfile.read())
+                    refactorings[commit] = json.loads(self.__run_refminer('-c', self._repository_path, commit))
+                    self._refactoring_cache.put_all(self._repo_full_name, {commit: refactorings[commit]}, REFMINER_VERSION)
 
         return refactorings
 
+    def __run_refminer_between_commits(self, commits: List[str]) -> Dict[str, Dict]:
+        """
+        Mine the given commits with a single RefactoringMiner run in commit range mode (-bc), if the smallest range
+        containing them is at most Options.REFMINER_BATCH_RANGE_FACTOR times the count of commits. RefactoringMiner
+        skips merge and root commits in range mode, so they are left to the single commit mode (-c). The results of
+        all the commits in the range are returned, so that they are cached as well.
+        """
+        candidates = [self.commit_index.get(commit) for commit in commits]
+        candidates = [c for c in candidates if len(c.parents) == 1]
+        if len(candidates) < 2:
+            return dict()
+
+        end = max(candidates, key=lambda c: c.committed_date)
+        start = min(candidates, key=lambda c: c.committed_date).parents[0]
+        commit_range = self.repository.git.rev_list(f'{start}..{end.hash}', no_merges=True).split()
+        if len(commit_range) > Options.REFMINER_BATCH_RANGE_FACTOR * len(candidates) or \
+                not {c.hash for c in candidates}.issubset(commit_range):
+            return dict()
+
+        log.info(f'Running RefMiner on {len(candidates)} commits ({len(commit_range)} commits in range {start}..{end.hash})')
+        try:
+            output = json.loads(self.__run_refminer('-bc', self._repository_path, start, end.hash))
+        except ValueError:
+            log.error(f'unable to parse RefMiner output for range {start}..{end.hash}')
+            return dict()
+
+        # each commit is stored in the same format as the output of the single commit mode
+        return {commit['sha1']: {'commits': [commit]} for commit in output.get('commits', list())}
+
+    @staticmethod
+    def __run_refminer(*args) -> str:
+        return subprocess.run([PATH_TO_REFMINER, *args], stdout=subprocess.PIPE, universal_newlines=True).stdout
+
     def __read_refactorings_for_commit(self, fix_commit_hash, fix_refactorings):
         refactorings = list()
         try:
@@ -96,24 +159,24 @@ class RASZZ(MASZZ):
             detect_move_from_other_files
         )
 
-        commits = set([blame.commit.hexsha for blame in candidate_blame_data])
+        commits = set([blame.commit_hash for blame in candidate_blame_data])
         refactorings = self._extract_refactorings(commits)
 
         to_reblame = dict()
         result_blame_data = set()
         for blame in candidate_blame_data:
             can_add = True
-            for refactoring in self.__read_refactorings_for_commit(blame.commit.hexsha, refactorings):
+            for refactoring in self.__read_refactorings_for_commit(blame.commit_hash, refactorings):
                 for location in refactoring['rightSideLocations']:
                     file_path = location['filePath']
                     from_line = location['startLine']
                     to_line   = location['endLine']
 
-                    if blame.file_path == file_path and blame.line_num >= from_line and blame.line_num <= to_line and blame.commit.hexsha not in ignore_revs_list:
+                    if blame.file_path == file_path and blame.line_num >= from_line and blame.line_num <= to_line and blame.commit_hash not in ignore_revs_list:
                         log.info(f'Ignoring {blame.file_path} line {blame.line_num} (refactoring {refactoring["type"]})')
-                        commit_key = blame.commit.hexsha + "@" + blame.file_path
+                        commit_key = blame.commit_hash + "@" + blame.file_path
                         if not commit_key in to_reblame:
-                            to_reblame[commit_key] = ReblameCandidate(blame.commit.hexsha, blame.file_path, {blame.line_num})
+                            to_reblame[commit_key] = ReblameCandidate(blame.commit_hash, blame.file_path, {blame.line_num})
                         else:
                             to_reblame[commit_key].modified_lines.add(blame.line_num)
                         can_add = False
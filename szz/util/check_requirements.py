@@ -1,7 +1,13 @@
+import json
+import os
+import shutil
 import subprocess
 from typing import List
 
-from packaging.version import parse
+from options import Options
+
+# the checks passed with these tool binaries are recorded in Options.CACHE_DIR
+_CACHE_FILE = 'requirements.json'
 
 
 def run_cmd(cmd: List[str]):
@@ -15,12 +21,37 @@ def run_cmd(cmd: List[str]):
     return stdout.decode('utf-8')
 
 
+def _tools_signature() -> List:
+    """ Return the path, size and modification time of the git and srcml binaries found in the system path """
+    signature = list()
+    for tool in ['git', 'srcml']:
+        path = shutil.which(tool)
+        if path is None:
+            return list()
+        stat = os.stat(path)
+        signature.append([os.path.realpath(path), stat.st_size, stat.st_mtime_ns])
+
+    return signature
+
+
 def check_requirements():
     """
     * git >= 2.23
 
     * srcML (https://www.srcml.org/) (i.e., the srcml command should be in the system path)
+
+    The checks are run again only if the git or srcml binaries change.
     """
+    cache_path = os.path.join(Options.CACHE_DIR, _CACHE_FILE)
+    signature = _tools_signature()
+    try:
+        with open(cache_path) as f:
+            if signature and json.load(f) == signature:
+                return
+    except (OSError, ValueError):
+        pass
+
+    from packaging.version import parse
 
     # check git client
     required_git_version = "2.23.0"
@@ -36,4 +67,15 @@ def check_requirements():
     try:
         run_cmd(['srcml', '--version'])
     except:
-        raise Exception(f"srcML tool is required, and the 'srcml' command should be in the system path. Please, fix")
\ No newline at end of file
+        raise Exception(f"srcML tool is required, and the 'srcml' command should be in the system path. Please, fix")
+
+    if signature:
+        try:
+            os.makedirs(Options.CACHE_DIR, exist_ok=True)
+            # written to a temp file and renamed, as concurrent runs can check the requirements at the same time
+            tmp_path = f'{cache_path}.{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                json.dump(signature, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,132 @@
+"""
+Lightweight tracing of the SZZ phases (workspace setup, diff parsing, blame, filters, srcML, RefactoringMiner...).
+
+Spans are recorded only when tracing is enabled with enable(). When it is disabled, span() returns a shared no-op
+span and traced() functions are called directly, so that the overhead is a function call and a flag check.
+Recorded spans are exported in the Chrome trace event format (chrome://tracing, https://ui.perfetto.dev), where
+nested spans of the same thread are displayed as a flame graph.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+_enabled = False
+_events = list()
+_lock = threading.Lock()
+
+
+class Span:
+    """ A timed section of code, recorded as a Chrome trace 'complete' event when it ends """
+
+    __slots__ = ('name', 'attributes', '_start')
+
+    def __init__(self, name: str, attributes: Dict):
+        self.name = name
+        self.attributes = attributes
+        self._start = None
+
+    def set(self, key: str, value):
+        """ Add an attribute to the span (e.g., a result count) """
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        event = {'name': self.name, 'cat': 'szz', 'ph': 'X',
+                 'ts': round(self._start * 1e6, 3), 'dur': round((end - self._start) * 1e6, 3),
+                 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.attributes}
+        with _lock:
+            _events.append(event)
+
+
+class _NoOpSpan:
+    """ Span returned when tracing is disabled """
+
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self) -> '_NoOpSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+def enable(enabled: bool = True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attributes):
+    """
+    Return a span to be used as a context manager:
+
+        with tracing.span('blame', file=file_path) as s:
+            ...
+            s.set('commits', len(commits))
+
+    :param str name: name of the span
+    :param attributes: attributes of the span, which must be JSON serializable
+    """
+    if not _enabled:
+        return _NO_OP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: str = None):
+    """
+    Decorator recording a span for each call of the decorated function, named after its qualified name by default.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, dict()):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def collect() -> List[Dict]:
+    """ Return the spans recorded so far and remove them from the buffer (e.g., to send them to another process) """
+    global _events
+    with _lock:
+        events, _events = _events, list()
+    return events
+
+
+def add_events(events: List[Dict]):
+    """ Add spans recorded by another process """
+    with _lock:
+        _events.extend(events)
+
+
+def export_chrome_trace(trace_path: str):
+    """ Write the recorded spans to the given file in the Chrome trace event format, and clear the buffer """
+    events = collect()
+    events.sort(key=lambda e: (e['pid'], e['tid'], e['ts'], -e['dur']))
+    with open(trace_path, 'w') as out:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, out, default=str)
@@ -0,0 +1,266 @@
+"""
+End-to-end benchmark of the SZZ variants over the bundled test repositories.
+
+Each variant is run with main.py (with --trace) in a separate process and a fresh working directory, so that the
+workspace and the persistent caches are cold. For each variant, the benchmark records the wall time (median of the
+repetitions), the count of git processes (through GIT_TRACE2_EVENT), the peak RSS of the process tree and the time
+spent in each phase (from the trace). The results are saved as JSON, and two result files can be compared to flag
+the regressions beyond a threshold.
+
+The startup benchmark measures, in fresh processes, the time to import main.py, to import the implementation of each
+variant and to check the requirements (the first check of a working directory, and the cached ones).
+
+USAGE (from the test folder):
+    python3 benchmark.py run [--variants b,ag,ma] [--repeat 3] [--out bench.json]
+    python3 benchmark.py compare base.json new.json [--threshold 0.1]
+    python3 benchmark.py startup [--variants b,ag,ma] [--repeat 10]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Dict, List
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+PYSZZ_HOME = os.path.dirname(TEST_DIR)
+
+# variant -> (input json, configuration file, zip of the test repositories)
+VARIANTS = {
+    'b': ('bugfix_commits_test.json', 'bszz.yml', 'repos_test.zip'),
+    'ag': ('bugfix_commits_test.json', 'agszz.yml', 'repos_test.zip'),
+    'ma': ('bugfix_commits_test.json', 'maszz.yml', 'repos_test.zip'),
+    'r': ('bugfix_commits_test.json', 'rszz.yml', 'repos_test.zip'),
+    'l': ('bugfix_commits_test.json', 'lszz.yml', 'repos_test.zip'),
+    'pd': ('bugfix_commits_test.json', 'pdszz.yml', 'repos_test.zip'),
+    'ra': ('bugfix_commits_raszz_test.json', 'raszz.yml', 'repos_test_raszz.zip'),
+    'a': ('bugfix_commits_dfszz_test.json', 'aszz.yml', 'repos_test_dfszz.zip'),
+    'df': ('bugfix_commits_dfszz_test.json', 'dfszz.yml', 'repos_test_dfszz.zip'),
+}
+
+# metrics compared by 'compare', where a higher value is worse
+METRICS = ['wall_s', 'git_processes', 'peak_rss_mb']
+
+# run in a fresh process by 'startup': prints the seconds spent importing main.py (and the class of the variant, if
+# any) and checking the requirements
+STARTUP_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import main
+if sys.argv[1]:
+    main.get_szz_class(sys.argv[1])
+imported = time.perf_counter()
+main.check_requirements()
+print(imported - start, time.perf_counter() - imported)
+'''
+
+
+def unpack_repos(zip_names: List[str], repos_root: str) -> Dict[str, str]:
+    """ Unpack each zip of test repositories once, returning zip name -> repos folder for the available zips """
+    repos_dirs = dict()
+    for zip_name in sorted(set(zip_names)):
+        zip_path = os.path.join(TEST_DIR, zip_name)
+        if not os.path.isfile(zip_path):
+            print(f'missing {zip_name}: skipping the variants using it', file=sys.stderr)
+            continue
+        with zipfile.ZipFile(zip_path) as z:
+            z.extractall(repos_root)
+        repos_dirs[zip_name] = os.path.join(repos_root, os.path.splitext(zip_name)[0])
+
+    return repos_dirs
+
+
+def run_variant(variant: str, repos_dir: str) -> Dict:
+    """ Run a variant once with main.py in a fresh working directory and return its metrics """
+    input_json, conf_file, _ = VARIANTS[variant]
+    work_dir = tempfile.mkdtemp(prefix=f'bench_{variant}_')
+    try:
+        env = dict(os.environ, GIT_TRACE2_EVENT=os.path.join(work_dir, 'git_trace2.jsonl'))
+        cmd = [sys.executable, os.path.join(PYSZZ_HOME, 'main.py'), os.path.join(TEST_DIR, input_json),
+               os.path.join(PYSZZ_HOME, 'conf', conf_file), repos_dir, '--trace']
+
+        start = time.perf_counter()
+        with open(os.path.join(work_dir, 'log.txt'), 'w') as log_file:
+            p = subprocess.Popen(cmd, cwd=work_dir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+            # wait4() returns the resource usage of the process tree (ru_maxrss is the peak RSS of its largest process)
+            _, status, rusage = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status >> 8
+        wall = time.perf_counter() - start
+
+        git_processes = 0
+        if os.path.isfile(env['GIT_TRACE2_EVENT']):
+            with open(env['GIT_TRACE2_EVENT']) as trace2:
+                git_processes = sum(1 for line in trace2 if '"event":"start"' in line)
+
+        phases = dict()
+        out_dir = os.path.join(work_dir, 'out')
+        trace_files = [f for f in os.listdir(out_dir) if f.endswith('.trace.json')] if os.path.isdir(out_dir) else list()
+        for trace_file in trace_files:
+            with open(os.path.join(out_dir, trace_file)) as f:
+                for event in json.load(f)['traceEvents']:
+                    phase = phases.setdefault(event['name'], {'total_s': 0.0, 'count': 0})
+                    phase['total_s'] += event['dur'] / 1e6
+                    phase['count'] += 1
+
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        peak_rss = rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+        result = {'exit_code': p.returncode, 'wall_s': wall, 'git_processes': git_processes,
+                  'peak_rss_mb': round(peak_rss, 1), 'phases': phases}
+        if p.returncode != 0:
+            with open(os.path.join(work_dir, 'log.txt'), errors='replace') as log_file:
+                result['error'] = log_file.read().strip().split('\n')[-1]
+
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run(variants: List[str], repeat: int, out_json: str):
+    repos_root = tempfile.mkdtemp(prefix='bench_repos_')
+    try:
+        repos_dirs = unpack_repos([VARIANTS[v][2] for v in variants], repos_root)
+
+        results = dict()
+        for variant in variants:
+            zip_name = VARIANTS[variant][2]
+            if zip_name not in repos_dirs:
+                continue
+
+            runs = [run_variant(variant, repos_dirs[zip_name]) for _ in range(repeat)]
+            # the run with the median wall time is reported, along with the wall time of each run
+            runs.sort(key=lambda r: r['wall_s'])
+            result = runs[(len(runs) - 1) // 2]
+            result['wall_s_runs'] = [round(r['wall_s'], 3) for r in runs]
+            result['wall_s'] = round(statistics.median(r['wall_s'] for r in runs), 3)
+            for phase in result['phases'].values():
+                phase['total_s'] = round(phase['total_s'], 3)
+            results[variant] = result
+
+            print(f"{variant:>3}: exit={result['exit_code']} wall={result['wall_s']:.2f}s "
+                  f"git={result['git_processes']} rss={result['peak_rss_mb']:.0f}MB {result.get('error', '')}")
+    finally:
+        shutil.rmtree(repos_root, ignore_errors=True)
+
+    report = {
+        'commit': git_describe(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'variants': results
+    }
+    with open(out_json, 'w') as out:
+        json.dump(report, out, indent=2)
+    print(f'results saved in {out_json}')
+
+
+def git_describe() -> str:
+    try:
+        commit = subprocess.check_output(['git', '-C', PYSZZ_HOME, 'rev-parse', 'HEAD'], text=True).strip()
+        dirty = subprocess.check_output(['git', '-C', PYSZZ_HOME, 'status', '--porcelain', '--untracked-files=no'], text=True).strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def startup(variants: List[str], repeat: int):
+    """ Print the median import and requirement check times of main.py alone and along with each variant """
+    work_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        env = dict(os.environ, PYTHONPATH=PYSZZ_HOME)
+
+        def measure(variant: str) -> List[float]:
+            out = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT, variant], cwd=work_dir, env=env, text=True)
+            return [float(t) for t in out.split()]
+
+        # the first requirement check of the working directory is not cached
+        _, first_check = measure('')
+        print(f"{'':<10} {'import':>9} {'check':>9}")
+        print(f"{'(uncached)':<10} {'':>9} {first_check * 1000:>7.1f}ms")
+        for variant in [''] + variants:
+            runs = [measure(variant) for _ in range(repeat)]
+            import_time = statistics.median(r[0] for r in runs)
+            check_time = statistics.median(r[1] for r in runs)
+            print(f"{variant or 'main':<10} {import_time * 1000:>7.1f}ms {check_time * 1000:>7.1f}ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(base_json: str, new_json: str, threshold: float) -> int:
+    """ Print the metrics of two result files, returning the count of regressions beyond the threshold """
+    with open(base_json) as f:
+        base = json.load(f)
+    with open(new_json) as f:
+        new = json.load(f)
+
+    print(f"base: {base['commit']}\nnew:  {new['commit']}\n")
+    regressions = 0
+    for variant in VARIANTS:
+        if variant not in base['variants'] or variant not in new['variants']:
+            continue
+        b, n = base['variants'][variant], new['variants'][variant]
+        for metric in METRICS:
+            change = (n[metric] - b[metric]) / b[metric] if b[metric] else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f'{variant:>3} {metric:<14} {b[metric]:>10} -> {n[metric]:>10} ({change:+.1%}){flag}')
+        if b['exit_code'] != n['exit_code']:
+            print(f"{variant:>3} exit code {b['exit_code']} -> {n['exit_code']}  REGRESSION")
+            regressions += 1
+
+        for phase in sorted(set(b['phases']) | set(n['phases'])):
+            b_time = b['phases'].get(phase, {}).get('total_s', 0.0)
+            n_time = n['phases'].get(phase, {}).get('total_s', 0.0)
+            print(f'{"":>3}   {phase:<24} {b_time:>9.3f}s -> {n_time:>9.3f}s')
+
+    print(f'\n{regressions} regressions beyond {threshold:.0%}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the SZZ variants over the bundled test repositories')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmark')
+    run_parser.add_argument('--variants', type=str, default=','.join(VARIANTS), help=f'comma separated variants (default {",".join(VARIANTS)})')
+    run_parser.add_argument('--repeat', type=int, default=3, help='runs of each variant, the median wall time is reported (default 3)')
+    run_parser.add_argument('--out', type=str, default=f'bench_{int(time.time())}.json', help='output json')
+
+    compare_parser = subparsers.add_parser('compare', help='compare two benchmark results')
+    compare_parser.add_argument('base_json', type=str)
+    compare_parser.add_argument('new_json', type=str)
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='relative increase flagged as regression (default 0.1)')
+
+    startup_parser = subparsers.add_parser('startup', help='measure the import and requirement check times')
+    startup_parser.add_argument('--variants', type=str, default=','.join(VARIANTS), help=f'comma separated variants (default {",".join(VARIANTS)})')
+    startup_parser.add_argument('--repeat', type=int, default=10, help='runs of each measure, the median time is reported (default 10)')
+
+    args = parser.parse_args()
+    if args.command == 'startup':
+        variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+        unknown = [v for v in variants if v not in VARIANTS]
+        if unknown:
+            parser.error(f'unknown variants: {unknown}')
+        if args.repeat < 1:
+            parser.error('invalid --repeat')
+        startup(variants, args.repeat)
+    elif args.command == 'run':
+        variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+        unknown = [v for v in variants if v not in VARIANTS]
+        if unknown:
+            parser.error(f'unknown variants: {unknown}')
+        if args.repeat < 1:
+            parser.error('invalid --repeat')
+        run(variants, args.repeat, args.out)
+    else:
+        sys.exit(1 if compare(args.base_json, args.new_json, args.threshold) > 0 else 0)
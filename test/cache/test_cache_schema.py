@@ -0,0 +1,89 @@
+# include project root in sys path
+import sys
+import os
+import multiprocessing as mp
+import shutil
+import subprocess
+import tempfile
+# insert at 1, 0 is the script path (or '' in REPL)
+sys.path.insert(1, os.path.abspath("../../"))
+
+from szz.common.blame_cache import BlameCache
+from szz.common.commit_index import CommitIndex
+from szz.common.refactoring_cache import RefactoringCache
+
+
+PROCESSES = 8
+ROUNDS = 10
+
+
+def open_blame_cache(barrier, cache_dir: str):
+    barrier.wait()
+    BlameCache(cache_dir).close()
+
+
+def open_refactoring_cache(barrier, cache_dir: str):
+    barrier.wait()
+    cache = RefactoringCache(cache_dir)
+    cache.put_all('repo', {f'{os.getpid():040d}': {'commits': []}}, 'version')
+    cache.close()
+
+
+def open_commit_index(barrier, cache_dir: str, repository_path: str, head: str):
+    barrier.wait()
+    index = CommitIndex('test/repo', repository_path, cache_dir)
+    index.update()
+    assert index.get(head).parents == list()
+    index.close()
+
+
+def open_concurrently(target, *args):
+    """ run target(barrier, *args) in PROCESSES processes, released at the same time, and return their exit codes """
+    barrier = mp.Barrier(PROCESSES)
+    processes = [mp.Process(target=target, args=(barrier,) + args) for _ in range(PROCESSES)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    return [p.exitcode for p in processes]
+
+
+if __name__ == "__main__":
+    """ test the blame cache opened by several processes at once on a new cache folder """
+    for _ in range(ROUNDS):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            exit_codes = open_concurrently(open_blame_cache, cache_dir)
+            print(exit_codes)
+            assert exit_codes == [0] * PROCESSES
+        finally:
+            shutil.rmtree(cache_dir)
+
+    """ test the refactoring cache opened by several processes at once on a new cache folder """
+    for _ in range(ROUNDS):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            exit_codes = open_concurrently(open_refactoring_cache, cache_dir)
+            print(exit_codes)
+            assert exit_codes == [0] * PROCESSES
+        finally:
+            shutil.rmtree(cache_dir)
+
+    """ test the commit index of a repository opened by several processes at once """
+    repo_dir = tempfile.mkdtemp()
+    try:
+        repository_path = os.path.join(repo_dir, 'repo')
+        subprocess.run(['git', 'init', '-q', repository_path], check=True)
+        subprocess.run(['git', '-C', repository_path, '-c', 'user.name=test', '-c', 'user.email=test@test',
+                        'commit', '-q', '--allow-empty', '-m', 'first'], check=True)
+        head = subprocess.run(['git', '-C', repository_path, 'rev-parse', 'HEAD'], check=True,
+                              stdout=subprocess.PIPE).stdout.decode().strip()
+        for _ in range(ROUNDS):
+            cache_dir = tempfile.mkdtemp(dir=repo_dir)
+            exit_codes = open_concurrently(open_commit_index, cache_dir, repository_path, head)
+            print(exit_codes)
+            assert exit_codes == [0] * PROCESSES
+    finally:
+        shutil.rmtree(repo_dir)
+
+    print("Test passed")
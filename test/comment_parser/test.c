@@ -0,0 +1,19 @@
+/* C
+ * code */
+#include <stdio.h>
+
+// line comment
+int main(void) {
+    char *s = "/* not a comment */"; // trailing
+    char c = '"';
+    /* block
+       comment */
+    int n = 1; /* trailing */
+        // line comment \
+           continued
+#if 0
+    // disabled
+#endif
+    printf("%s %c // %d\n", s, c, n);
+    /* unterminated "string" */ return 0;
+}
@@ -0,0 +1,16 @@
+/* Java
+   code */
+public class Test {
+
+    // line comment
+    String s = "// not a comment \" /* still not */";
+    char c = '\'';
+    /**
+     * javadoc
+     */
+    public int test() {
+        int n = 0; // trailing
+        /* block */ n++;
+        return n;
+    }
+}
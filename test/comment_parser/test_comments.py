@@ -1,11 +1,12 @@
 # include project root in sys path
 import sys
 import os
+import shutil
 # insert at 1, 0 is the script path (or '' in REPL)
 sys.path.insert(1, os.path.abspath("../../"))
 
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
-from szz.core.comment_parser import parse_comments
+from szz.core.comment_parser import parse_comments, parse_comments_srcml, CommentIndex, CommentRange
 
 
 """ test python comment parser """
@@ -87,4 +88,31 @@ for comment_range, oracle in zip(comment_ranges, comments):
     print(comment_range)
     assert comment_range.start == oracle[0] and comment_range.end == oracle[1]
 
+""" test C-family comment parser (comments starting on the first line are not reported, as with srcML) """
+for source_file_name, comments in [('test.c', [[5, 5], [9, 10], [12, 13], [18, 18]]),
+                                   ('test.java', [[5, 5], [8, 10], [13, 13]])]:
+    with open(source_file_name) as f:
+        source_file_content = f.read()
+
+    for i, l in enumerate(source_file_content.split("\n")):
+        print(i + 1, l)
+
+    comment_ranges = parse_comments(source_file_content, source_file_name)
+
+    assert len(comments) == len(comment_ranges)
+    for comment_range, oracle in zip(comment_ranges, comments):
+        print(comment_range)
+        assert comment_range.start == oracle[0] and comment_range.end == oracle[1]
+
+    # srcML is the oracle of the built-in parser, when available
+    if shutil.which('srcml'):
+        assert comment_ranges == parse_comments_srcml(source_file_content, source_file_name)
+
+""" test comment index lookup """
+comment_index = CommentIndex([CommentRange(10, 12), CommentRange(2, 2), CommentRange(11, 15), CommentRange(16, 16), CommentRange(20, 21)])
+
+assert len(comment_index) == 3
+for line_num in range(1, 25):
+    assert (line_num in comment_index) == (line_num in {2, 10, 11, 12, 13, 14, 15, 16, 20, 21})
+
 print("+++ Test passed +++")
\ No newline at end of file
@@ -0,0 +1,54 @@
+# include project root in sys path
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+# insert at 1, 0 is the script path (or '' in REPL)
+sys.path.insert(1, os.path.abspath("../../"))
+
+from git import GitCommandError
+
+from szz.core.object_reader import GitObjectReader
+
+
+repo_dir = tempfile.mkdtemp()
+try:
+    with open(os.path.join(repo_dir, 'a file'), 'w') as f:
+        f.write('first line\nsecond line\n')
+    subprocess.run(['git', 'init', '-q', repo_dir], check=True)
+    subprocess.run(['git', '-C', repo_dir, 'add', '.'], check=True)
+    subprocess.run(['git', '-C', repo_dir, '-c', 'user.name=test', '-c', 'user.email=test@test',
+                    'commit', '-q', '-m', 'first'], check=True)
+    blob_hash = subprocess.run(['git', '-C', repo_dir, 'rev-parse', 'HEAD:a file'], check=True,
+                               stdout=subprocess.PIPE).stdout.decode().strip()
+
+    reader = GitObjectReader(repo_dir)
+
+    """ test a path with a space """
+    assert reader.read('HEAD:a file') == (blob_hash, b'first line\nsecond line\n')
+
+    """ test missing objects, whose path has no space, one space or more spaces """
+    for rev_spec in ['HEAD:nosuch', 'HEAD:no such', 'HEAD:no such file']:
+        try:
+            reader.read(rev_spec)
+            assert False, rev_spec
+        except GitCommandError as e:
+            print(e)
+            assert f'{rev_spec} missing' in str(e)
+
+    """ test pipelined requests with a missing object """
+    try:
+        reader.read_many(['HEAD:a file', 'HEAD:no such', 'HEAD:a file'])
+        assert False
+    except GitCommandError as e:
+        assert 'HEAD:no such missing' in str(e)
+
+    # the process is still in sync after the errors
+    assert reader.read_many(['HEAD:a file', 'HEAD:a file']) == [(blob_hash, b'first line\nsecond line\n')] * 2
+
+    reader.close()
+finally:
+    shutil.rmtree(repo_dir)
+
+print("Test passed")
@@ -0,0 +1,73 @@
+# include project root in sys path
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+# insert at 1, 0 is the script path (or '' in REPL)
+sys.path.insert(1, os.path.abspath("../../"))
+
+from options import Options
+from szz.core.abstract_szz import ImpactedFile, LineChangeType
+from szz.ma_szz import MASZZ
+
+
+def git(*args) -> str:
+    return subprocess.run(['git', '-C', repo_path, '-c', 'user.name=test', '-c', 'user.email=test@test'] + list(args),
+                          check=True, stdout=subprocess.PIPE).stdout.decode().strip()
+
+
+def commit(message: str, files: dict) -> str:
+    for path, content in files.items():
+        with open(os.path.join(repo_path, path), 'w') as f:
+            f.write(content)
+    git('add', '.')
+    git('commit', '-q', '-m', message)
+    return git('rev-parse', 'HEAD')
+
+
+def find_bic(incremental: bool) -> set:
+    MASZZ.INCREMENTAL_REBLAME = incremental
+    with MASZZ('test/reblame', '', repos_dir) as szz:
+        bic = szz.find_bic(fix, [ImpactedFile('f.c', [1, 2, 3], LineChangeType.MODIFY)], max_change_size=20)
+        return {c.hexsha for c in bic}
+
+
+""" test that the incremental re-blame of MA-SZZ is the same as blaming all the modified lines again """
+work_dir = tempfile.mkdtemp()
+cwd = os.getcwd()
+try:
+    os.chdir(work_dir)
+    Options.CACHE_DIR = os.path.join(work_dir, 'cache')
+    repos_dir = os.path.join(work_dir, 'repos')
+    repo_path = os.path.join(repos_dir, 'test', 'reblame')
+    os.makedirs(repo_path)
+    git('init', '-q')
+
+    header = ''.join(f'int v{i} = {i};\n' for i in range(20))
+    footer = ''.join(f'int w{i} = {i};\n' for i in range(20))
+    # W adds a block of 3 lines. git blame -M detects the lines moved as a block only if it has more than 20
+    # alphanumeric characters, i.e. if all of its 3 lines are blamed at the same time
+    block = 'alpha1 = 1;\nbravo2 = 2;\ncharl3 = 3;\n'
+    commit('init', {'f.c': header + footer})
+    w = commit('W', {'f.c': header + block + footer})
+    # X edits 2 lines of the block, along with 25 other files: it is excluded by the change size filter
+    edited = 'alpha1 = 1;\nbravo2 = 20;\ncharl3 = 30;\n'
+    commit('X', dict({'f.c': header + edited + footer}, **{f'other{i}.c': f'int x{i};\n' for i in range(25)}))
+    # Z moves the block to the top of the file
+    commit('Z', {'f.c': edited + header + footer})
+    # F fixes the block
+    fixed = 'alpha1 = 10;\nbravo2 = 21;\ncharl3 = 31;\n'
+    fix = commit('F', {'f.c': fixed + header + footer})
+
+    full = find_bic(incremental=False)
+    incremental = find_bic(incremental=True)
+    print(full, incremental)
+    assert full == {w}
+    assert incremental == full
+finally:
+    MASZZ.INCREMENTAL_REBLAME = True
+    os.chdir(cwd)
+    shutil.rmtree(work_dir)
+
+print("Test passed")